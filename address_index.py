@@ -0,0 +1,210 @@
+"""Index local d'adresses (Base Adresse Nationale) pour géocoder sans appel réseau.
+
+L'index est construit une fois à partir des CSV de la BAN (un fichier par
+département, https://adresse.data.gouv.fr/data/ban/adresses/latest/csv/) :
+
+    python address_index.py adresses-75.csv.gz adresses-92.csv.gz ... index_adresses/
+
+puis activé dans l'application avec `ADDRESS_INDEX_DIR=index_adresses/`.
+
+Les clés normalisées (voir `normalize_address`) sont triées et stockées
+dans des tableaux NumPy chargés en mémoire partagée (`mmap`) : une recherche par
+préfixe est une recherche dichotomique, sans chargement de l'index en RAM.
+"""
+
+import argparse
+import bisect
+import csv
+import gzip
+import io
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+
+INDEX_DIR = os.getenv("ADDRESS_INDEX_DIR")
+# Départements d'Île-de-France retenus par défaut lors de la construction
+IDF_DEPARTMENTS = ("75", "77", "78", "91", "92", "93", "94", "95")
+SUGGESTION_LIMIT = 8
+# Nombre maximal de candidats examinés par `lookup` ; au-delà, l'adresse est jugée ambiguë
+MAX_TOKEN_CANDIDATES = 2_000
+# Écart (en degrés, ≈ 10 m) en dessous duquel plusieurs candidats désignent le même point
+SAME_POINT_TOLERANCE = 1e-4
+FILES = ("keys", "key_offsets", "labels", "label_offsets", "coords")
+
+
+def normalize_address(address):
+    """Clé normalisée : minuscules, sans accents ni ponctuation, espaces réduits."""
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+
+class _Strings:
+    """Vue séquence (indexable, triée) sur des chaînes concaténées : utilisable par `bisect`."""
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._data[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+
+class AddressIndex:
+    def __init__(self, directory):
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in FILES}
+        self._keys = _Strings(arrays["keys"], arrays["key_offsets"])
+        self._labels = _Strings(arrays["labels"], arrays["label_offsets"])
+        self._coords = arrays["coords"]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _prefix_range(self, prefix):
+        prefix = prefix.encode("ascii")
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + b"\x7f", lo)
+        return lo, hi
+
+    def _words_range(self, text):
+        """Lignes des clés égales à `text` ou qui le prolongent par des mots entiers."""
+        lo, hi = self._prefix_range(text + " ")
+        exact = bisect.bisect_left(self._keys, text.encode("ascii"), 0, lo)
+        if exact < lo and self._keys[exact] == text.encode("ascii"):
+            lo = exact  # la clé exacte précède immédiatement ses prolongements
+        return lo, hi
+
+    def _resolve(self, rows):
+        """(lon, lat) si toutes les lignes désignent le même point, sinon None."""
+        if len(rows) == 0 or len(rows) > MAX_TOKEN_CANDIDATES:
+            return None
+        coords = np.asarray(self._coords[rows], dtype=np.float64)
+        if (coords.max(axis=0) - coords.min(axis=0)).max() > SAME_POINT_TOLERANCE:
+            return None
+        lon, lat = coords[0]
+        return float(lon), float(lat)
+
+    def lookup(self, address):
+        """Retourne (lon, lat) de l'adresse, ou None si elle n'est pas dans l'index ou
+        si elle est ambiguë (même voie dans plusieurs communes, saisie incomplète...).
+
+        Cherche d'abord les clés qui commencent par l'adresse normalisée (mots entiers :
+        un dernier mot inachevé ne suffit pas, contrairement à `suggest`), puis retire
+        les derniers mots un à un en exigeant que les mots retirés figurent dans la clé
+        (par exemple un code postal et une commune saisis dans un autre ordre). Le
+        résultat n'est retenu que si tous les candidats désignent le même point.
+        """
+        tokens = normalize_address(address).split()
+        if not tokens:
+            return None
+        lo, hi = self._words_range(" ".join(tokens))
+        if lo < hi:
+            return self._resolve(np.arange(lo, hi)) if hi - lo <= MAX_TOKEN_CANDIDATES else None
+
+        for size in range(len(tokens) - 1, 1, -1):
+            lo, hi = self._words_range(" ".join(tokens[:size]))
+            if lo == hi:
+                continue
+            if hi - lo > MAX_TOKEN_CANDIDATES:
+                return None
+            required = set(tokens[size:])
+            rows = [i for i in range(lo, hi) if required <= set(self._keys[i].decode("ascii").split())]
+            return self._resolve(np.array(rows, dtype=np.int64))
+        return None
+
+    def suggest(self, text, limit=SUGGESTION_LIMIT):
+        """Adresses complètes commençant par le texte saisi, pour l'autocomplétion."""
+        prefix = normalize_address(text)
+        if not prefix:
+            return []
+        lo, hi = self._prefix_range(prefix)
+        return [self._labels[i].decode("utf-8") for i in range(lo, min(hi, lo + limit))]
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_address_index():
+    """Index du processus si `ADDRESS_INDEX_DIR` est défini, sinon None."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                if INDEX_DIR:
+                    try:
+                        _index = AddressIndex(INDEX_DIR)
+                    except OSError as e:
+                        print(f"Index d'adresses indisponible ({INDEX_DIR}) : {e}")
+                _index_loaded = True
+    return _index
+
+
+def _read_ban(path, departments):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as raw:
+        for row in csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8"), delimiter=";"):
+            if departments and not row["code_postal"].startswith(departments):
+                continue
+            yield row
+
+
+def build_index(paths, directory, departments=IDF_DEPARTMENTS):
+    """Construit l'index à partir de CSV de la BAN ; retourne le nombre d'entrées."""
+    entries = {}
+    streets = {}
+    for path in paths:
+        for row in _read_ban(path, departments):
+            lon, lat = float(row["lon"]), float(row["lat"])
+            street = f"{row['nom_voie']}, {row['code_postal']} {row['nom_commune']}"
+            number = f"{row['numero']}{' ' + row['rep'] if row['rep'] else ''}"
+            # Adresse complète : "10 bis rue de rivoli paris 75004"
+            key = normalize_address(f"{number} {row['nom_voie']} {row['nom_commune']} {row['code_postal']}")
+            entries.setdefault(key, (f"{number} {street}", lon, lat))
+            # Voie seule, positionnée au centre de ses numéros
+            street_key = normalize_address(f"{row['nom_voie']} {row['nom_commune']} {row['code_postal']}")
+            total = streets.setdefault(street_key, [street, 0.0, 0.0, 0])
+            total[1] += lon
+            total[2] += lat
+            total[3] += 1
+
+    for key, (label, lon, lat, count) in streets.items():
+        entries.setdefault(key, (label, lon / count, lat / count))
+
+    keys = sorted(entries)
+    labels = [entries[key][0].encode("utf-8") for key in keys]
+    encoded_keys = [key.encode("ascii") for key in keys]
+    coords = np.array([entries[key][1:] for key in keys], dtype=np.float32).reshape(-1, 2)
+
+    os.makedirs(directory, exist_ok=True)
+    for name, strings in (("keys", encoded_keys), ("labels", labels)):
+        offsets = np.zeros(len(strings) + 1, dtype=np.uint64)
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+        np.save(os.path.join(directory, f"{name}.npy"), np.frombuffer(b"".join(strings), dtype=np.uint8))
+        np.save(os.path.join(directory, f"{name[:-1]}_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "coords.npy"), coords)
+    return len(keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit l'index local d'adresses à partir de CSV de la BAN.")
+    parser.add_argument("inputs", nargs="+", help="fichiers adresses-XX.csv[.gz] de la BAN")
+    parser.add_argument("output", help="dossier de l'index")
+    parser.add_argument("--departements", nargs="*", default=list(IDF_DEPARTMENTS),
+                        help="préfixes de codes postaux retenus (Île-de-France par défaut, vide pour tout garder)")
+    args = parser.parse_args(argv)
+
+    count = build_index(args.inputs, args.output, tuple(args.departements))
+    print(f"{count} adresses indexées dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,27 @@
+from datetime import datetime, timedelta
+
 import streamlit as st
 import requests
-from datetime import datetime
-import pandas as pd
-import pydeck as pdk
-import polyline
-import time
-import os
-import folium
-from streamlit_folium import folium_static
-
-
-API_KEY = os.getenv('API_KEY') 
-
-# URL de base de l'API
-BASE_URL = 'https://prim.iledefrance-mobilites.fr/marketplace'
+import streamlit.components.v1 as components
+
+import address_index
+import cache
+import geocoding
+import http_client
+import maps
+import metrics
+import parallel
+import prim
+import scheduler
+import sweep
+import velib
+from geometry import decode_polylines
+from summary import summarize_bike_route, summarize_journey
+
+
+# Temps de chaque étape de ce rerun (panneau de débogage), agrégés aussi pour tout le processus
+trace = metrics.start_trace()
+metrics.start_metrics_server()
 
 st.set_page_config(
     page_title="Calculateur d'itinéraire IDFM",  # Le titre que tu veux pour l'onglet
@@ -57,27 +65,28 @@ st.markdown(
     </div>
     """, unsafe_allow_html=True)
 
-# Fonction pour géocoder une adresse avec Nominatim
+# Champ d'adresse avec suggestions tirées de l'index local d'adresses, s'il est configuré
+def address_input(label, key):
+    address = st.text_input(label, key=key)
+    index = address_index.get_address_index()
+    if index is not None and len(address) >= 3:
+        suggestions = index.suggest(address)
+        if suggestions and address not in suggestions:
+            choice = st.selectbox(
+                "Suggestions", suggestions, index=None, key=f"{key}_suggestion",
+                placeholder="Choisir une adresse proposée", label_visibility="collapsed"
+            )
+            if choice:
+                address = choice
+    return address
+
+# Fonction pour géocoder une adresse avec Nominatim (cache persistant, débit limité à 1 req/s)
 def geocode_address_nominatim(address):
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": address,
-        "format": "json",
-        "limit": 1,
-        "countrycodes": "fr"  # Limite les recherches à la France
-    }
-    headers = {
-        "User-Agent": "MonApplication/1.0 (votre@email.com)"  # User-Agent personnalisé obligatoire
-    }
     try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        if data:
-            longitude = data[0]["lon"]
-            latitude = data[0]["lat"]
-            return f"{longitude};{latitude}"
+        with metrics.span("geocode"):
+            coords = geocoding.geocode(address)
+        if coords:
+            return coords
         else:
             st.warning(f"Aucun résultat trouvé pour l'adresse : {address}")
             return None
@@ -85,232 +94,137 @@ def geocode_address_nominatim(address):
         st.error(f"Erreur lors du géocodage : {e}")
         return None
 
-# Fonction pour ajouter les itinéraires sur la carte
-def add_route_to_map(map_obj, section, color, dash_array, stop_date_times, display_name, mode):
-    # Si c'est un itinéraire de type public_transport, chercher les coordonnées dans geojson
-    geojson = section.get("geojson", {})
-
-    coordinates = geojson.get("coordinates", None)
-
-    if coordinates:
-        # Tracer une polyline entre chaque paire successive de coordonnées
-        for i in range(len(coordinates) - 1):
-            try:
-                from_coords = coordinates[i]  # Coordonnée actuelle [lon, lat]
-                to_coords = coordinates[i + 1]  # Coordonnée suivante [lon, lat]
-
-                # Inverser l'ordre pour correspondre au format [lat, lon] de Folium
-                from_lon, from_lat = from_coords
-                to_lon, to_lat = to_coords
-
-                # Ajouter une polyline sur la carte entre chaque paire de coordonnées
-                folium.PolyLine(
-                    locations=[[from_lat, from_lon], [to_lat, to_lon]],  # [lat, lon] attendu par Folium
-                    color=color,
-                    weight=4,
-                    opacity=0.8,
-                    dash_array=dash_array
-                ).add_to(map_obj)
-            except (IndexError, ValueError) as e:
-                print(f"Erreur dans 'public_transport', erreur: {e}")
-                continue
-
-        for stop in stop_date_times:
-            # Extraire les coordonnées de la station
-            stop_coords = stop.get("stop_point", {}).get("coord", {})
-            stop_name = stop.get("stop_point", {}).get("name", "Station inconnue")
-            lat = stop_coords.get("lat")
-            lon = stop_coords.get("lon")
-
-            # Vérifier si les coordonnées existent et ajouter un marqueur sur la carte
-            if lat and lon:
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=5,
-                    color=color,  # Contour
-                    fill=True,
-                    fill_color="white", # Intérieur blanc
-                    fill_opacity=1,
-                    tooltip=f"{mode} {display_name} - {stop_name}"  # Affichage du tooltip
-                ).add_to(map_obj)
-
-
-
-
-# Fonction pour récupérer un itinéraire via l'API Ile-de-France Mobilités
-def get_journey(from_coords, to_coords):
-    url = f'{BASE_URL}/v2/navitia/journeys'
-    headers = {
-        "apiKey": API_KEY
-    }
-    params = {
-        "from": from_coords,
-        "to": to_coords
-    }
+# Appel PRIM (clé d'API partagée) : la position dans la file d'attente s'affiche si le quota
+# est saturé, et un résultat ancien issu du cache est signalé s'il remplace une réponse en échec
+def call_prim(fetch, error_message):
+    placeholder = st.empty()
+
+    def show_wait(position, wait):
+        if wait >= 1:
+            placeholder.info(f"⏳ Forte demande : {position} requête(s) avant la vôtre, attente estimée {wait:.0f} s")
+
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        with scheduler.on_wait(show_wait):
+            result = fetch()
+    except scheduler.CircuitOpenError as e:
+        st.error(f"Le service PRIM est momentanément indisponible. Réessayez dans {e.retry_after:.0f} s.")
+        return None
     except requests.exceptions.RequestException as e:
-        st.error(f"Erreur lors de la récupération de l'itinéraire : {e}")
+        st.error(f"{error_message} : {e}")
         return None
+    finally:
+        placeholder.empty()
 
-def display_journey_choices(journey_data):
-    if "journeys" not in journey_data or not journey_data["journeys"]:
-        st.warning("Aucun itinéraire trouvé.")
-        return
+    fallback_age = cache.pop_fallback_age()
+    if fallback_age is not None:
+        st.warning(f"Le service PRIM ne répond pas : affichage d'un résultat obtenu il y a {fallback_age // 60:.0f} min.")
+    return result
 
-    st.subheader("Choix d'itinéraires disponibles :")
-    for idx, journey in enumerate(journey_data["journeys"]):
-        departure_time = journey.get("departure_date_time", None)
-        arrival_time = journey.get("arrival_date_time", None)
-        if departure_time and arrival_time:
-            departure_time = datetime.strptime(departure_time, "%Y%m%dT%H%M%S").strftime('%H:%M')
-            arrival_time = datetime.strptime(arrival_time, "%Y%m%dT%H%M%S").strftime('%H:%M')
-        else:
-            departure_time, arrival_time = "Inconnu", "Inconnu"
+# Fonction pour récupérer un itinéraire via l'API Ile-de-France Mobilités (résultats mis en cache)
+def get_journey(from_coords, to_coords):
+    with metrics.span("get_journey"):
+        return call_prim(lambda: prim.get_journey(from_coords, to_coords),
+                         "Erreur lors de la récupération de l'itinéraire")
 
-        total_duration = journey.get("duration", 0)
-        if total_duration >= 3600:
-            hours = total_duration // 3600
-            minutes = (total_duration % 3600) // 60
-            duration_str = f"{hours} h {minutes:02d} min"
-        else:
-            duration_str = f"{total_duration // 60} min"
+# Balayage d'une plage d'heures de départ : itinéraires distincts classés selon `ranking`
+SWEEP_RANKINGS = {"duration_s": "Durée", "co2_g": "CO₂", "fare_eur": "Prix"}
 
-        co2_emission = journey.get("co2_emission", {}).get("value", None)
-        co2_str = f"{round(co2_emission)} g" if co2_emission is not None else "Inconnu"
+def sweep_journeys(from_coords, to_coords, start, end, step, ranking):
+    with metrics.span("journey_sweep"):
+        return call_prim(lambda: sweep.sweep_journeys(from_coords, to_coords, start, end, step, ranking),
+                         "Erreur lors de la récupération des itinéraires")
 
-        fare = journey.get("fare", {}).get("total", {}).get("value", None)
-        if fare is None:
-            fare = 0
-        fare_in_euros = float(fare) / 100
-        fare_str = f"{fare_in_euros:.2f} €"
+def display_journey_choices(journeys):
+    if not journeys:
+        st.warning("Aucun itinéraire trouvé.")
+        return
+
+    with metrics.span("render_journeys"):
+        _display_journeys(journeys)
 
+
+def _display_journeys(journeys):
+    st.subheader("Choix d'itinéraires disponibles :")
+    for idx, journey in enumerate(journeys):
+        journey_summary = summarize_journey(journey)
         expander_title = (
-            f"🛤️ Itinéraire {idx + 1} | Départ : {departure_time} | Arrivée : {arrival_time} | "
-            f"Durée : {duration_str} | CO₂ : {co2_str} | Prix : {fare_str}"
+            f"🛤️ Itinéraire {idx + 1} | Départ : {journey_summary['departure']} | Arrivée : {journey_summary['arrival']} | "
+            f"Durée : {journey_summary['duration']} | CO₂ : {journey_summary['co2']} | Prix : {journey_summary['fare']}"
         )
 
-        journey_map = folium.Map(location=[48.8566, 2.3522], zoom_start=12, tiles = "cartodbpositron")  # Coordonnées de Paris par défaut
+        map_key = maps.journey_key(journey)
 
         with st.expander(expander_title):
-            for section in journey["sections"]:
-                # Initialiser style
-                color = "808080" # gris
-                dash_array = ""
-                stop_date_times = []
-                display_name = ""
-                mode = ""
-
-                section_type = section["type"]
-
-                if section_type == "street_network":
-                    from_name = section.get("from", {}).get("name", "Point inconnu")
-                    to_name = section.get("to", {}).get("name", "Point inconnu")
-                    duration = section.get("duration", 0)
-                    dash_array = "5, 5"
+            for section in journey.sections:
+                duration = section.duration
+
+                if section.type == "street_network":
+                    from_name = section.from_name or "Point inconnu"
+                    to_name = section.to_name or "Point inconnu"
                     st.write(f"- 🚶‍♂️ Marche ({duration // 60} minutes) : {from_name} -> {to_name}")
 
-                elif section_type == "public_transport":
-                    from_name = section.get("from", {}).get("name", "Arrêt inconnu")
-                    to_name = section.get("to", {}).get("name", "Arrêt inconnu")
-                    mode = section.get("display_informations", {}).get("commercial_mode", "Transport")
-                    line = section.get("display_informations", {}).get("label", "Ligne inconnue")
-                    duration = section.get("duration", 0)
-                    color = section.get("display_informations", {}).get("color")  # Couleur de la ligne
-                    dash_array = "" # trait continu
-                    display_name = section.get("display_informations", {}).get("name", "Nom indisponible")  # Nom affiché de la station
+                elif section.type == "public_transport":
+                    from_name = section.from_name or "Arrêt inconnu"
+                    to_name = section.to_name or "Arrêt inconnu"
+                    mode = section.mode or "Transport"
+                    line = section.label or "Ligne inconnue"
                     st.write(f"- 🚇 {mode} {line} ({duration // 60} minutes) : {from_name} -> {to_name}")
 
-                    # Récupérer le tableau stop_date_times et afficher les stations
-                    stop_date_times = section.get("stop_date_times", [])
-                    
-
-                elif section_type == "transfer":
-                    duration = section.get("duration", 0)
-                    dash_array = "5, 5"
+                elif section.type == "transfer":
                     st.write(f"- 🔄 Correspondance ({duration // 60} minutes)")
 
-                add_route_to_map(journey_map, section, color=f"#{color}", dash_array=dash_array, stop_date_times=stop_date_times, display_name=display_name, mode=mode)  # Ajouter l'itinéraire sur la carte
-
-            # Affichage de la carte dans Streamlit
-            st.write("### Carte de l'itinéraire")
-            folium_static(journey_map)
+            # La carte n'est construite qu'à la demande, puis réutilisée depuis le cache
+            if st.toggle("🗺️ Afficher la carte de l'itinéraire", key=f"map_{idx}_{map_key[:12]}"):
+                st.write("### Carte de l'itinéraire")
+                with metrics.span("folium_map"):
+                    map_html = maps.journey_map_html(journey, map_key)
+                components.html(map_html, height=maps.MAP_HEIGHT + 10, width=maps.MAP_WIDTH)
 
         st.markdown("---")
 
 
 # Deuxième Programme : Calculateur d'itinéraires vélo et des stations Vélib
 
-# Fonction pour décoder les géométries Google Polyline
-def decode_polyline(polyline_str):
-    decoded_points = [{"lat": lat, "lon": lon} for lat, lon in polyline.decode(polyline_str)]
-    for point in decoded_points:
-        point["lat"] /= 10
-        point["lon"] /= 10
-    return decoded_points
-
 def separate_coordinates(coord_str):
     longitude, latitude = map(float, coord_str.split(";"))
     return longitude, latitude
 
 def fetch_computed_routes(waypoints, bike_details):
-    url = f'{BASE_URL}/computedroutes?geometry=true'
-    data = {
-        "waypoints": waypoints,
-        "bikeDetails": bike_details,
-        "transportModes": ["BIKE"]
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "apikey": API_KEY
-    }
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erreur lors de la requête API : {e}")
-        return None
-
-# Fonction pour obtenir les données de disponibilité des vélos et bornes
-def get_station_status():
-    url = f'{BASE_URL}/velib/station_status.json'
-    headers = {
-        'apiKey': API_KEY
-    }
-    
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return response.json().get("data", {}).get("stations", [])
+    with metrics.span("fetch_computed_routes"):
+        return call_prim(lambda: prim.get_bike_routes(waypoints, bike_details), "Erreur lors de la requête API")
+
+# Évolution récente d'une station (ex. ", -4 en 30 min"), si l'historique couvre au moins 5 minutes
+def station_trend(stations, station, column):
+    minutes = int(stations.attrs.get("trend_seconds", 0) // 60)
+    if column not in station or minutes < 5 or not station[column]:
+        return ""
+    return f", {station[column]:+d} en {minutes} min"
+
+def display_best_stations(station_index, origin, destination, e_bike):
+    stations = station_index.stations
+    bike_type = "électriques" if e_bike else "mécaniques"
+    bike_column = "ebike_bikes" if e_bike else "mechanical_bikes"
+    trend_column = "ebike_trend" if e_bike else "mechanical_trend"
+
+    rows, distances = station_index.nearest(*origin, kind="bike", e_bike=e_bike)
+    if len(rows):
+        station = stations.iloc[rows[0]]
+        st.info(
+            f"🚲 Station de départ conseillée : {station['name']} à {distances[0]:.0f} m "
+            f"({station[bike_column]} vélos {bike_type} disponibles{station_trend(stations, station, trend_column)})"
+        )
     else:
-        st.error(f"Erreur {response.status_code}: Impossible de récupérer les données.")
-        return None
-    
-# Fonction pour obtenir les données vélib
-def get_station_information():
-    url = f'{BASE_URL}/velib/station_information.json'
-    headers = {
-        'apiKey': API_KEY
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json().get("data", {}).get("stations", [])
+        st.warning(f"Aucune station avec des vélos {bike_type} disponibles.")
+
+    rows, distances = station_index.nearest(*destination, kind="dock")
+    if len(rows):
+        station = stations.iloc[rows[0]]
+        st.info(
+            f"🅿️ Station d'arrivée conseillée : {station['name']} à {distances[0]:.0f} m "
+            f"({station['num_docks_available']} places libres{station_trend(stations, station, 'docks_trend')})"
+        )
     else:
-        st.error(f"Erreur {response.status_code}: Impossible de récupérer les données.")
-        return None
-    
-# Combiner les informations des stations et leurs statuts
-def merge_station_data(station_info, station_status):
-    info_df = pd.DataFrame(station_info)
-    status_df = pd.DataFrame(station_status)
-    # Fusionner les deux DataFrames sur "station_id"
-    merged_data = pd.merge(info_df, status_df, on="station_id", how="inner")
-    return merged_data
-
+        st.warning("Aucune station avec des places libres.")
 
 
 # Interface utilisateur avec Streamlit : Sélection de l'onglet
@@ -318,166 +232,146 @@ tabs = st.tabs(["🚉 Transport public", "🚲 Vélo"])
 
 with tabs[0]:
     st.header("🚉 Transport public")
-    departure_address = st.text_input("🏳️ Adresse de départ :", key="from_public")
-    arrival_address = st.text_input("📍 Adresse d'arrivée :", key="to_public")
+    departure_address = address_input("🏳️ Adresse de départ :", key="from_public")
+    arrival_address = address_input("📍 Adresse d'arrivée :", key="to_public")
+
+    sweep_enabled = st.toggle("🕗 Comparer plusieurs heures de départ", key="sweep_public")
+    if sweep_enabled:
+        columns = st.columns(3)
+        sweep_start = columns[0].time_input("Départ à partir de", step=timedelta(minutes=5), key="sweep_start")
+        sweep_window = columns[1].selectbox("Pendant", [30, 60, 90, 120], index=1,
+                                            format_func=lambda minutes: f"{minutes} min", key="sweep_window")
+        sweep_step = columns[2].selectbox("Toutes les", [5, 10, 15, 30], index=1,
+                                          format_func=lambda minutes: f"{minutes} min", key="sweep_step")
+        sweep_ranking = st.radio("Classer par", list(SWEEP_RANKINGS), format_func=SWEEP_RANKINGS.get,
+                                 horizontal=True, key="sweep_ranking")
 
     if st.button("Calculer l'itinéraire", key="button_public"):
+        st.session_state["public_journey_data"] = None
         if departure_address and arrival_address:
             st.info("Géocodage des adresses...")
-            from_coords = geocode_address_nominatim(departure_address)
-            time.sleep(1)
-            to_coords = geocode_address_nominatim(arrival_address)
+            # Les deux géocodages partent en même temps (le débit Nominatim reste limité)
+            from_coords, to_coords = parallel.run_parallel(
+                lambda: geocode_address_nominatim(departure_address),
+                lambda: geocode_address_nominatim(arrival_address),
+            )
 
             if from_coords and to_coords:
-                st.info("Récupération de l'itinéraire...")
-                journey_data = get_journey(from_coords, to_coords)
-                if journey_data:
-                    display_journey_choices(journey_data)
+                if sweep_enabled:
+                    st.info("Récupération des itinéraires sur la plage horaire...")
+                    start = datetime.combine(datetime.now().date(), sweep_start)
+                    st.session_state["public_journey_data"] = sweep_journeys(
+                        from_coords, to_coords, start, start + timedelta(minutes=sweep_window),
+                        timedelta(minutes=sweep_step), sweep_ranking
+                    )
+                else:
+                    st.info("Récupération de l'itinéraire...")
+                    st.session_state["public_journey_data"] = get_journey(from_coords, to_coords)
         else:
             st.warning("Veuillez entrer les deux adresses.")
 
+    # Le résultat est conservé dans la session pour survivre aux reruns (affichage d'une carte...)
+    if st.session_state.get("public_journey_data") is not None:
+        display_journey_choices(st.session_state["public_journey_data"])
+
 with tabs[1]:
     st.header("🚲 Vélo")
-    departure_address = st.text_input("🏳️ Adresse de départ :", key="from_bike")
-    arrival_address = st.text_input("📍 Adresse d'arrivée :", key="to_bike")
+    departure_address = address_input("🏳️ Adresse de départ :", key="from_bike")
+    arrival_address = address_input("📍 Adresse d'arrivée :", key="to_bike")
     e_bike = st.checkbox("⚡ Vélo électrique", value=False)
 
-    # Obtenir les données vélib
-    station_info = get_station_information()
-    station_status = get_station_status()
+    # Instantané des stations Vélib partagé par toutes les sessions, rafraîchi en arrière-plan
+    with metrics.span("velib_snapshot"):
+        station_snapshot = velib.get_snapshot()
+        station_data, station_age = station_snapshot.get()
+        if station_data is None:
+            station_snapshot.wait_ready(timeout=velib.FIRST_LOAD_TIMEOUT)
+            station_data, station_age = station_snapshot.get()
 
-    if not station_info or not station_status:
+    if station_data is None:
         st.warning("Impossible de récupérer les données des stations ou leurs statuts.")
+        if station_snapshot.last_error:
+            st.error(f"Erreur lors de la récupération des données : {station_snapshot.last_error}")
     else:
-        # Fusionner les données
-        station_data = merge_station_data(station_info, station_status)
-
-        # Ajouter une colonne avec des informations détaillées pour le tooltip
-        def extract_bike_types(bike_types):
-            """Extraire les vélos mécaniques et électriques depuis `num_bikes_available_types`."""
-            mechanical = next((item.get("mechanical", 0) for item in bike_types if "mechanical" in item), 0)
-            ebike = next((item.get("ebike", 0) for item in bike_types if "ebike" in item), 0)
-            return mechanical, ebike
-
-        station_data["mechanical_bikes"], station_data["ebike_bikes"] = zip(
-            *station_data["num_bikes_available_types"].apply(extract_bike_types)
-        )
-
-        station_data["tooltip_info"] = (
-            "<b>Nom:</b> " + station_data["name"] + "<br/>"
-            "<b>Vélos disponibles:</b> " + station_data["num_bikes_available"].astype(str) + "<br/>"
-            "<b>Types de vélos:</b> " +
-            "Mécaniques: " + station_data["mechanical_bikes"].astype(str) + ", Électriques: " + station_data["ebike_bikes"].astype(str) + "<br/>"
-            "<b>Places libres:</b> " + station_data["num_docks_available"].astype(str)
-        )
+        st.caption(f"Disponibilités Vélib mises à jour il y a {int(station_age)} s")
 
     if st.button("Calculer l'itinéraire", key="button_bike"):
         if departure_address and arrival_address:
             st.info("Géocodage des adresses...")
-            from_coords = geocode_address_nominatim(departure_address)
-            # Séparer en longitude et latitude
-            from_longitude, from_latitude = separate_coordinates(from_coords)
-            time.sleep(1)
-            to_coords = geocode_address_nominatim(arrival_address)
-            # Séparer en longitude et latitude
-            to_longitude, to_latitude = separate_coordinates(to_coords)
-
-            waypoints = [
-                {"latitude": from_latitude, "longitude": from_longitude, "title": departure_address},
-                {"latitude": to_latitude, "longitude": to_longitude, "title": arrival_address}
-            ]
-
-            bike_details = {
-                "eBike": e_bike
-            }
-
-            result = fetch_computed_routes(waypoints, bike_details)
-            if result:
-                st.success("Itinéraires récupérés avec succès.")
-
-                # Affichage clair des résultats
-                st.subheader("Choix d'itinéraires disponibles :")
-                for idx, journey in enumerate(result):
-                    # Extraction des informations générales
-                    title = journey.get("title", "Itinéraire")
-                    duration = journey.get("duration", 0)
-                    departure_time = journey.get("estimatedDatetimeOfDeparture")
-                    arrival_time = journey.get("estimatedDatetimeOfArrival")
-
-                    # Conversion des durées et heures
-                    duration_str = f"{duration // 60} min" if duration < 3600 else f"{duration // 3600} h {duration % 3600 // 60} min"
-                    departure_time = datetime.fromisoformat(departure_time).strftime('%H:%M') if departure_time else "Inconnu"
-                    arrival_time = datetime.fromisoformat(arrival_time).strftime('%H:%M') if arrival_time else "Inconnu"
-
-                    # Détails des distances
-                    distances = journey.get("distances", {})
-                    total_distance = distances.get("total", 0)
-
-                    # Titre de l'expander
-                    expander_title = (
-                        f"{title} | Départ : {departure_time} | Arrivée : {arrival_time} | Durée : {duration_str} | Distance : {total_distance / 1000:.1f} km"
-                    )
+            # Les deux géocodages partent en même temps (le débit Nominatim reste limité)
+            from_coords, to_coords = parallel.run_parallel(
+                lambda: geocode_address_nominatim(departure_address),
+                lambda: geocode_address_nominatim(arrival_address),
+            )
 
-                    with st.expander(expander_title):
-                        # Visualisation de l'itinéraire sur une carte
-                        st.write("#### Carte de l'itinéraire")
+            if from_coords and to_coords:
+                # Séparer en longitude et latitude
+                from_longitude, from_latitude = separate_coordinates(from_coords)
+                to_longitude, to_latitude = separate_coordinates(to_coords)
+
+                waypoints = [
+                    {"latitude": from_latitude, "longitude": from_longitude, "title": departure_address},
+                    {"latitude": to_latitude, "longitude": to_longitude, "title": arrival_address}
+                ]
+
+                bike_details = {
+                    "eBike": e_bike
+                }
+
+                # Stations conseillées : vélo disponible près du départ, place libre près de l'arrivée
+                station_index = station_snapshot.get_index()
+                if station_index is not None:
+                    display_best_stations(station_index, (from_longitude, from_latitude), (to_longitude, to_latitude), e_bike)
+
+                result = fetch_computed_routes(waypoints, bike_details)
+                if result:
+                    st.success("Itinéraires récupérés avec succès.")
+
+                    # Affichage clair des résultats
+                    st.subheader("Choix d'itinéraires disponibles :")
+                    with metrics.span("render_bike_routes"):
+                        for idx, journey in enumerate(result):
+                            route_summary = summarize_bike_route(journey)
+
+                            # Titre de l'expander
+                            expander_title = (
+                                f"{route_summary['title']} | Départ : {route_summary['departure']} | Arrivée : {route_summary['arrival']} | "
+                                f"Durée : {route_summary['duration']} | Distance : {route_summary['distance']}"
+                            )
+
+                            with st.expander(expander_title):
+                                # Visualisation de l'itinéraire sur une carte
+                                st.write("#### Carte de l'itinéraire")
                         
-                        sections = journey.get("sections", [])
-                        for section in sections:
-                            geometry = section.get("geometry")
-                            if geometry:  # Si une géométrie est fournie
-                                path = decode_polyline(geometry)  # Décoder la polyligne
-                                map_data = pd.DataFrame(path)  # Créer un DataFrame pour pydeck
-                                
-                                # Vérification des colonnes lat et lon
-                                if 'lat' not in map_data.columns or 'lon' not in map_data.columns:
-                                    st.write("Les coordonnées n'ont pas les bonnes colonnes 'lat' et 'lon'.")
-                                else:
-                                    midpoint = map_data.mean().to_dict()
-
-                                    # Formatage des données pour PathLayer
-                                    path_data = [{'path': list(zip(map_data['lon'], map_data['lat']))}]
-
-                                    st.pydeck_chart(pdk.Deck(
-                                        map_style="mapbox://styles/mapbox/streets-v11",
-                                        initial_view_state=pdk.ViewState(
-                                            latitude=midpoint["lat"],
-                                            longitude=midpoint["lon"],
-                                            zoom=12
-                                        ),
-                                        layers=[
-                                            # Couche des stations Vélib'
-                                            pdk.Layer(
-                                                "ScatterplotLayer",
-                                                data=station_data,
-                                                get_position="[lon, lat]",
-                                                get_radius=25,
-                                                get_fill_color=[0, 128, 0],  # Couleur des stations
-                                                pickable=True,
-                                                auto_highlight=True  # Pour mettre en surbrillance au survol
-                                                
-                                            ),
-                                            # Couche des itinéraires
-                                            pdk.Layer(
-                                                "PathLayer",
-                                                data=path_data,
-                                                get_path="path",  # Chaque élément "path" est une liste de [lon, lat]
-                                                get_width=10,
-                                                get_color=[0, 0, 255],
-                                                pickable=True
-                                            )
-                                        ],
-                                        tooltip={
-                                            "html": "{tooltip_info}",
-                                            "style": {"color": "white"}
-                                            }
-                                    ))
-                            else:
-                                st.write("Aucune géométrie disponible pour cette section.")
-
-                    st.markdown("---")
-            else:
-                st.error("Aucun itinéraire disponible.")
+                                sections = journey.get("sections", [])
+                                geometries = [section.get("geometry") for section in sections]
+                                for geometry in geometries:
+                                    if not geometry:
+                                        st.write("Aucune géométrie disponible pour cette section.")
+                                # Décoder toutes les polylignes de l'itinéraire en un seul lot
+                                paths = decode_polylines([geometry for geometry in geometries if geometry])
+
+                                # Une seule carte pour toutes les sections de l'itinéraire
+                                if paths:
+                                    with metrics.span("pydeck_map"):
+                                        deck = maps.build_bike_deck(paths, station_data)
+                                    st.pydeck_chart(deck)
+
+                            st.markdown("---")
+                else:
+                    st.error("Aucun itinéraire disponible.")
         else:
             st.warning("Veuillez entrer les deux adresses.")
 
+# Panneau de débogage : temps de chaque étape de ce rerun et quantiles depuis le démarrage
+if st.sidebar.toggle("⏱️ Temps par étape", key="debug_timings"):
+    st.sidebar.write(f"Ce rerun : {trace.elapsed() * 1000:.0f} ms")
+    st.sidebar.dataframe(trace.rows(), hide_index=True)
+    st.sidebar.write("Depuis le démarrage du serveur :")
+    st.sidebar.dataframe(metrics.summary_rows(), hide_index=True)
+    st.sidebar.write("Appels vers les API et appels évités (requêtes identiques regroupées) :")
+    st.sidebar.dataframe(metrics.counter_rows(), hide_index=True)
+    st.sidebar.write("Caches (succès, échecs, évictions...) :")
+    st.sidebar.dataframe(metrics.collected_rows("cache"), hide_index=True)
+    st.sidebar.write("Files d'attente et disjoncteurs :")
+    st.sidebar.json(http_client.scheduler_stats(), expanded=False)
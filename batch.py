@@ -0,0 +1,303 @@
+"""Calcul d'itinéraires en lot, sans Streamlit.
+
+Chaque ligne du CSV d'entrée (colonnes `id`, `from`, `to` et, en option, `mode`
+et `e_bike`) est géocodée puis envoyée à l'API d'itinéraires. Une ligne de
+résultat est écrite par itinéraire proposé, avec les mêmes champs que les titres
+de l'application (horaires, durée, CO₂, prix, distance).
+
+Les résultats sont écrits au fil de l'eau (CSV, ou dossier de fichiers Parquet)
+et les identifiants traités sont notés dans `<sortie>.checkpoint` : relancer la
+même commande reprend là où le traitement s'était arrêté. Une ligne dont l'API
+reste indisponible malgré les nouvelles tentatives n'est ni écrite ni notée :
+elle est reprise à l'exécution suivante.
+
+Usage : python batch.py entrees.csv resultats.parquet [--mode public|bike] [--workers 8]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import geocoding
+import http_client
+import prim
+import scheduler
+from summary import summarize_bike_route, summarize_journey
+
+
+MODES = ("public", "bike")
+DEFAULT_WORKERS = 8
+PARQUET_FLUSH_EVERY = 500  # lignes d'entrée par fichier Parquet
+PROGRESS_EVERY = 100
+# Erreurs d'API temporaires : nouvel essai de la ligne pendant au plus RETRY_WINDOW secondes
+RETRY_WINDOW = 600  # secondes
+RETRY_DELAY = 5  # secondes ; disjoncteur ouvert : délai annoncé par `CircuitOpenError`
+
+FIELDS = [
+    "id", "mode", "option", "status", "error",
+    "from_address", "to_address", "from_coords", "to_coords",
+    "title", "departure", "arrival", "duration_s", "co2_g", "fare_eur", "distance_m",
+]
+
+
+def compute_pair(from_address, to_address, mode="public", e_bike=False):
+    """Géocode les deux adresses et retourne (from_coords, to_coords, résumés des itinéraires).
+
+    Lève `LookupError` si une adresse est introuvable et
+    `requests.exceptions.RequestException` en cas d'erreur d'API.
+    """
+    from_coords = geocoding.geocode(from_address)
+    if not from_coords:
+        raise LookupError(f"Aucun résultat trouvé pour l'adresse : {from_address}")
+    to_coords = geocoding.geocode(to_address)
+    if not to_coords:
+        raise LookupError(f"Aucun résultat trouvé pour l'adresse : {to_address}")
+
+    if mode == "public":
+        journeys = prim.get_journey(from_coords, to_coords) or []
+        summaries = [summarize_journey(journey) for journey in journeys]
+    else:
+        from_longitude, from_latitude = map(float, from_coords.split(";"))
+        to_longitude, to_latitude = map(float, to_coords.split(";"))
+        waypoints = [
+            {"latitude": from_latitude, "longitude": from_longitude, "title": from_address},
+            {"latitude": to_latitude, "longitude": to_longitude, "title": to_address}
+        ]
+        routes = prim.get_bike_routes(waypoints, {"eBike": e_bike}) or []
+        summaries = [summarize_bike_route(route) for route in routes]
+    return from_coords, to_coords, summaries
+
+
+def _parse_bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "oui", "vrai")
+
+
+def is_transient(error):
+    """Erreur d'API passagère (réseau, disjoncteur ouvert, 429/5xx), qui mérite un nouvel essai."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          scheduler.CircuitOpenError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in http_client.RETRY_STATUSES
+    return False
+
+
+def _compute_with_retry(from_address, to_address, mode, e_bike):
+    """`compute_pair`, réessayé tant que l'API est indisponible, dans la limite de RETRY_WINDOW."""
+    deadline = time.monotonic() + RETRY_WINDOW
+    while True:
+        try:
+            return compute_pair(from_address, to_address, mode, e_bike)
+        except requests.exceptions.RequestException as e:
+            if not is_transient(e):
+                raise
+            delay = e.retry_after if isinstance(e, scheduler.CircuitOpenError) else RETRY_DELAY
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+
+
+def process_row(row_id, row, default_mode, default_e_bike):
+    """Lignes de résultat pour une ligne d'entrée.
+
+    Les erreurs définitives (mode inconnu, adresse introuvable, requête refusée par
+    l'API en 4xx) sont rapportées dans `status`/`error` ; une erreur passagère
+    (`is_transient`) est levée si l'API reste indisponible, pour que la ligne soit
+    reprise plus tard.
+    """
+    mode = (row.get("mode") or default_mode).strip().lower()
+    e_bike = _parse_bool(row["e_bike"]) if row.get("e_bike") else default_e_bike
+    base = {field: None for field in FIELDS}
+    base.update({
+        "id": row_id,
+        "mode": mode,
+        "from_address": row.get("from", ""),
+        "to_address": row.get("to", ""),
+    })
+    if mode not in MODES:
+        return [dict(base, status="error", error=f"Mode inconnu : {mode}")]
+
+    try:
+        # Les lots passent après les utilisateurs de l'application sur les quotas partagés
+        with scheduler.priority(scheduler.BATCH):
+            from_coords, to_coords, summaries = _compute_with_retry(
+                base["from_address"], base["to_address"], mode, e_bike
+            )
+    except LookupError as e:
+        return [dict(base, status="error", error=str(e))]
+    except requests.exceptions.RequestException as e:
+        if is_transient(e):
+            raise
+        return [dict(base, status="error", error=str(e))]
+
+    base.update(from_coords=from_coords, to_coords=to_coords)
+    if not summaries:
+        return [dict(base, status="no_result")]
+    return [
+        dict(base, status="ok", option=option, **{key: value for key, value in summary.items() if key in FIELDS})
+        for option, summary in enumerate(summaries, start=1)
+    ]
+
+
+class CsvOutput:
+    flush_every = 1
+
+    def __init__(self, path):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+        if is_new:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetOutput:
+    """Dossier de fichiers `part-NNNNN.parquet`, un par groupe de lignes écrit."""
+
+    flush_every = PARQUET_FLUSH_EVERY
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self._schema = pa.schema([
+            (field, pa.int64() if field in ("option", "duration_s") else
+             pa.float64() if field in ("co2_g", "fare_eur", "distance_m") else pa.string())
+            for field in FIELDS
+        ])
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._part = len([name for name in os.listdir(path) if name.endswith(".parquet")])
+        self._rows = []
+
+    def write(self, rows):
+        self._rows.extend(rows)
+
+    def flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        # Écriture dans un fichier temporaire puis renommage : pas de fichier partiel après une interruption
+        final_path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        self._pq.write_table(table, final_path + ".tmp")
+        os.replace(final_path + ".tmp", final_path)
+        self._part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_output(path):
+    if path.endswith(".csv"):
+        return CsvOutput(path)
+    return ParquetOutput(path)
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def run_batch(input_path, output_path, mode="public", e_bike=False, workers=DEFAULT_WORKERS, log=print):
+    """Traite le CSV d'entrée en flux avec au plus `workers` lignes en cours.
+
+    Les limites de débit par fournisseur restent appliquées par `http_client`.
+    Retourne le nombre de lignes d'entrée traitées lors de cet appel.
+    """
+    checkpoint_path = f"{output_path.rstrip(os.sep)}.checkpoint"
+    done = read_checkpoint(checkpoint_path)
+    if done:
+        log(f"Reprise : {len(done)} lignes déjà traitées")
+
+    output = open_output(output_path)
+    processed = 0
+    failed = 0
+    unsaved_ids = []
+    start = time.monotonic()
+
+    with open(input_path, newline="", encoding="utf-8-sig") as input_file, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+
+        def save():
+            # Les identifiants ne sont notés qu'une fois leurs résultats écrits
+            output.flush()
+            checkpoint.writelines(f"{row_id}\n" for row_id in unsaved_ids)
+            checkpoint.flush()
+            unsaved_ids.clear()
+
+        def collect(futures):
+            nonlocal processed, failed
+            for future in futures:
+                row_id = pending.pop(future)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    # Ni écrite ni notée dans le checkpoint : reprise à la prochaine exécution
+                    failed += 1
+                    log(f"Ligne {row_id} non traitée : {e}")
+                    continue
+                output.write(rows)
+                unsaved_ids.append(row_id)
+                processed += 1
+                if processed % PROGRESS_EVERY == 0:
+                    log(f"{processed} lignes traitées ({processed / (time.monotonic() - start):.1f} lignes/s)")
+            if len(unsaved_ids) >= output.flush_every:
+                save()
+
+        pending = {}
+        for line_number, row in enumerate(csv.DictReader(input_file), start=1):
+            row_id = (row.get("id") or "").strip() or str(line_number)
+            if row_id in done:
+                continue
+            done.add(row_id)
+            while len(pending) >= workers:
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(completed)
+            pending[executor.submit(process_row, row_id, row, mode, e_bike)] = row_id
+
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(completed)
+        save()
+
+    output.close()
+    log(f"Terminé : {processed} lignes traitées en {time.monotonic() - start:.1f} s")
+    if failed:
+        log(f"{failed} lignes en échec temporaire : relancer la même commande pour les reprendre")
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcul d'itinéraires en lot à partir d'un CSV.")
+    parser.add_argument("input", help="CSV avec les colonnes id, from, to (et en option mode, e_bike)")
+    parser.add_argument("output", help="fichier .csv, ou dossier de fichiers Parquet")
+    parser.add_argument("--mode", choices=MODES, default="public", help="mode par défaut des lignes")
+    parser.add_argument("--e-bike", action="store_true", help="vélo électrique par défaut (mode bike)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="lignes traitées simultanément")
+    args = parser.parse_args(argv)
+
+    run_batch(args.input, args.output, args.mode, args.e_bike, args.workers,
+              log=lambda message: print(message, file=sys.stderr))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Mesure la taille JSON envoyée par rendu d'un itinéraire vélo (pydeck), avant/après.
+
+Usage : python benchmarks/bench_deck.py [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+import polyline
+import pydeck as pdk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+import maps  # noqa: E402
+import velib  # noqa: E402
+from geometry import decode_polylines  # noqa: E402
+
+
+def legacy_decode_polyline(polyline_str):
+    decoded_points = [{"lat": lat, "lon": lon} for lat, lon in polyline.decode(polyline_str)]
+    for point in decoded_points:
+        point["lat"] /= 10
+        point["lon"] /= 10
+    return decoded_points
+
+
+def legacy_decks(sections, station_data):
+    # Ancienne version : une carte par section, avec toutes les stations et toutes leurs colonnes
+    decks = []
+    for section in sections:
+        map_data = pd.DataFrame(legacy_decode_polyline(section["geometry"]))
+        midpoint = map_data.mean().to_dict()
+        path_data = [{'path': list(zip(map_data['lon'], map_data['lat']))}]
+        decks.append(pdk.Deck(
+            map_style="mapbox://styles/mapbox/streets-v11",
+            initial_view_state=pdk.ViewState(latitude=midpoint["lat"], longitude=midpoint["lon"], zoom=12),
+            layers=[
+                pdk.Layer("ScatterplotLayer", data=station_data, get_position="[lon, lat]", get_radius=25,
+                          get_fill_color=[0, 128, 0], pickable=True, auto_highlight=True),
+                pdk.Layer("PathLayer", data=path_data, get_path="path", get_width=10,
+                          get_color=[0, 0, 255], pickable=True),
+            ],
+            tooltip={"html": "{tooltip_info}", "style": {"color": "white"}},
+        ))
+    return decks
+
+
+def new_decks(sections, station_data):
+    paths = decode_polylines([section["geometry"] for section in sections])
+    return [maps.build_bike_deck(paths, station_data)]
+
+
+def measure(routes, station_data, build, repeat):
+    timings, sizes = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sizes = [sum(maps.deck_payload_bytes(deck) for deck in build(route["sections"], station_data)) for route in routes]
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / len(routes), statistics.mean(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    station_data = velib.build_station_data(
+        fixtures.load("station_information")["data"]["stations"],
+        fixtures.load("station_status")["data"]["stations"],
+    )
+    routes = fixtures.load("computedroutes")
+    print(f"{len(routes)} itinéraires, {len(station_data)} stations")
+
+    baseline = None
+    for label, build in [("avant (une carte par section)", legacy_decks), ("après (carte unique filtrée)", new_decks)]:
+        elapsed, size = measure(routes, station_data, build, args.repeat)
+        baseline = baseline or (elapsed, size)
+        print(f"{label:<32} {size / 1024:8.1f} Kio/rendu  {elapsed * 1000:7.1f} ms/rendu  "
+              f"(x{baseline[1] / size:.1f} plus léger)")
+
+
+if __name__ == "__main__":
+    main()
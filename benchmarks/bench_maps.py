@@ -0,0 +1,105 @@
+"""Compare la carte Folium d'un itinéraire avant/après le tracé en une seule polyline.
+
+Usage : python benchmarks/bench_maps.py [fixture.json] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import folium
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model  # noqa: E402
+from maps import add_route_to_map, section_style  # noqa: E402
+
+DEFAULT_FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "journeys.json")
+
+
+def legacy_add_route_to_map(map_obj, section, color, dash_array, stop_date_times, display_name, mode):
+    # Ancienne version : une polyline par paire de points et les arrêts directement sur la carte
+    coordinates = section.get("geojson", {}).get("coordinates", None)
+    if coordinates:
+        for i in range(len(coordinates) - 1):
+            from_lon, from_lat = coordinates[i]
+            to_lon, to_lat = coordinates[i + 1]
+            folium.PolyLine(
+                locations=[[from_lat, from_lon], [to_lat, to_lon]],
+                color=color, weight=4, opacity=0.8, dash_array=dash_array
+            ).add_to(map_obj)
+        for stop in stop_date_times:
+            stop_coords = stop.get("stop_point", {}).get("coord", {})
+            stop_name = stop.get("stop_point", {}).get("name", "Station inconnue")
+            lat, lon = stop_coords.get("lat"), stop_coords.get("lon")
+            if lat and lon:
+                folium.CircleMarker(
+                    location=[lat, lon], radius=5, color=color, fill=True, fill_color="white",
+                    fill_opacity=1, tooltip=f"{mode} {display_name} - {stop_name}"
+                ).add_to(map_obj)
+
+
+def build_legacy_map(journey):
+    journey_map = folium.Map(location=[48.8566, 2.3522], zoom_start=12, tiles="cartodbpositron")
+    for section in journey["sections"]:
+        info = section.get("display_informations", {})
+        public = section["type"] == "public_transport"
+        legacy_add_route_to_map(
+            journey_map, section,
+            color=f"#{info.get('color', '808080')}",
+            dash_array="" if public else "5, 5",
+            stop_date_times=section.get("stop_date_times", []) if public else [],
+            display_name=info.get("name", ""),
+            mode=info.get("commercial_mode", ""),
+        )
+    return journey_map.get_root().render()
+
+
+def build_map(journey, **kwargs):
+    journey_map = folium.Map(location=[48.8566, 2.3522], zoom_start=12, tiles="cartodbpositron")
+    for section in journey.sections:
+        add_route_to_map(journey_map, section, **section_style(section), **kwargs)
+    return journey_map.get_root().render()
+
+
+def measure(journeys, repeat, build, **kwargs):
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = sum(len(build(journey, **kwargs).encode("utf-8")) for journey in journeys)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixture", nargs="?", default=DEFAULT_FIXTURE)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding="utf-8") as f:
+        payload = json.load(f)
+    journeys = payload["journeys"]
+    parsed = model.parse_journeys(payload)
+    points = sum(len(s.get("geojson", {}).get("coordinates", [])) for j in journeys for s in j["sections"])
+    print(f"{len(journeys)} itinéraires, {points} points")
+
+    variants = [
+        ("avant (polyline par segment)", journeys, build_legacy_map, {}),
+        ("après, sans simplification", parsed, build_map, {"tolerance": 0}),
+        ("après, simplification par défaut", parsed, build_map, {}),
+    ]
+    baseline = None
+    for label, data, build, kwargs in variants:
+        elapsed, size = measure(data, args.repeat, build, **kwargs)
+        baseline = baseline or (elapsed, size)
+        print(f"{label:<34} {elapsed * 1000:8.1f} ms  {size / 1024:8.1f} Kio  "
+              f"(x{baseline[0] / elapsed:.1f} plus rapide, x{baseline[1] / size:.1f} plus léger)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare le décodage d'une réponse Navitia : dictionnaires complets et modèle compact.
+
+Usage : python benchmarks/bench_model.py [--copies N] [--repeat N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+import model  # noqa: E402
+from summary import summarize_journey  # noqa: E402
+
+
+def legacy_summarize(journey):
+    """Lecture des champs du résumé telle qu'elle était faite sur les dictionnaires Navitia."""
+    departure = datetime.strptime(journey["departure_date_time"], "%Y%m%dT%H%M%S").strftime("%H:%M")
+    arrival = datetime.strptime(journey["arrival_date_time"], "%Y%m%dT%H%M%S").strftime("%H:%M")
+    co2 = journey.get("co2_emission", {}).get("value", None)
+    fare = float(journey.get("fare", {}).get("total", {}).get("value", None) or 0) / 100
+    return departure, arrival, journey.get("duration", 0), co2, fare
+
+
+def legacy_parse(payload):
+    journeys = json.loads(payload)["journeys"]
+    for journey in journeys:
+        legacy_summarize(journey)
+    return journeys
+
+
+def parse(payload):
+    journeys = model.parse_journeys(payload)
+    for journey in journeys:
+        summarize_journey(journey)
+    return journeys
+
+
+def parse_with_geometry(payload):
+    """Comme `parse`, tracés convertis en tableaux NumPy (itinéraires affichés sur une carte)."""
+    journeys = parse(payload)
+    for journey in journeys:
+        for section in journey.sections:
+            section.geometry
+    return journeys
+
+
+def measure(decode, payloads, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        timings.append(time.perf_counter() - start)
+
+    # Mémoire : pic pendant le décodage et taille des résultats conservés (comme dans le cache)
+    gc.collect()
+    tracemalloc.start()
+    kept = [decode(payload) for payload in payloads]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return statistics.median(timings) / len(payloads), peak, retained / len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=50, help="réponses décodées par mesure")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = json.dumps(fixtures.load("journeys")).encode("utf-8")
+    payloads = [bytes(payload) for _ in range(args.copies)]
+    decoder = "orjson" if model.orjson is not None else "json"
+    print(f"réponse de {len(payload) / 1024:.1f} Kio, {args.copies} copies, décodeur {decoder}")
+
+    variants = [
+        ("avant (dictionnaires json)", legacy_parse),
+        ("après (modèle compact)", parse),
+        ("après, tracés convertis", parse_with_geometry),
+    ]
+    baseline = None
+    for label, decode in variants:
+        elapsed, peak, retained = measure(decode, payloads, args.repeat)
+        baseline = baseline or (elapsed, retained)
+        print(f"{label:<30} {elapsed * 1000:7.2f} ms/réponse  pic {peak / 1024:8.1f} Kio  "
+              f"conservé {retained / 1024:7.1f} Kio/réponse  "
+              f"(x{baseline[0] / elapsed:.1f} plus rapide, x{baseline[1] / retained:.1f} plus léger)")
+
+
+if __name__ == "__main__":
+    main()
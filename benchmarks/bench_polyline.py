@@ -0,0 +1,63 @@
+"""Compare le décodage des géométries vélo : ancienne version (listes de dicts) et décodeur NumPy.
+
+Usage : python benchmarks/bench_polyline.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import pandas as pd
+import polyline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+from geometry import decode_polyline, decode_polylines  # noqa: E402
+
+
+def legacy(geometries):
+    # Ancienne chaîne : dicts par point, division par 10, DataFrame puis tuples pour pydeck
+    paths = []
+    for geometry in geometries:
+        decoded_points = [{"lat": lat, "lon": lon} for lat, lon in polyline.decode(geometry)]
+        for point in decoded_points:
+            point["lat"] /= 10
+            point["lon"] /= 10
+        map_data = pd.DataFrame(decoded_points)
+        map_data.mean().to_dict()
+        paths.append(list(zip(map_data['lon'], map_data['lat'])))
+    return paths
+
+
+def one_by_one(geometries):
+    paths = [decode_polyline(geometry) for geometry in geometries]
+    return paths, [path.mean(axis=0) for path in paths]
+
+
+def batch(geometries):
+    paths = decode_polylines(geometries)
+    return paths, [path.mean(axis=0) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    geometries = [section["geometry"] for route in fixtures.load("computedroutes") for section in route["sections"]]
+    points = sum(len(path) for path in decode_polylines(geometries))
+    print(f"{len(geometries)} géométries, {points} points")
+
+    baseline = None
+    for label, decode in [("polyline + dicts + DataFrame", legacy), ("NumPy, une à une", one_by_one), ("NumPy, en lot", batch)]:
+        elapsed = min(timeit.repeat(lambda: decode(geometries), number=1, repeat=args.repeat))
+        baseline = baseline or elapsed
+        print(f"{label:<30} {elapsed * 1000:8.2f} ms  (x{baseline / elapsed:.1f})")
+
+
+if __name__ == "__main__":
+    main()
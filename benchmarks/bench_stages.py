@@ -0,0 +1,186 @@
+"""Temps de chaque étape de l'application, contre le serveur local de `stub_server`.
+
+Étapes mesurées : géocodage (réseau puis cache), appel journeys, flux Vélib,
+`merge_station_data`, `build_station_data`, rafraîchissement incrémental des stations
+tel que fait par l'application (magasin puis index spatial), décodage des géométries,
+carte Folium et carte pydeck. Aucune requête ne part vers les vraies API.
+
+Les résultats sont enregistrés dans `benchmarks/results/<version>.json` et comparés
+au fichier de résultats précédent (ou à `--baseline`) : une étape plus lente que
+`--threshold` fois la référence est signalée et le code de sortie vaut 1.
+
+Usage : python benchmarks/bench_stages.py [--repeat N] [--latency MS] [--error-rate X] [--baseline FICHIER]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures  # noqa: E402
+import stub_server  # noqa: E402
+
+
+DEFAULT_THRESHOLD = 1.3
+
+
+def _configure_environment(base_url):
+    # À faire avant d'importer les modules de l'application, qui lisent l'environnement à l'import
+    os.environ.update({
+        "PRIM_BASE_URL": f"{base_url}/marketplace",
+        "NOMINATIM_URL": f"{base_url}/search",
+        "API_KEY": "benchmark",
+        "GEOCODE_CACHE_PATH": ":memory:",
+        # Les limites de débit des vraies API fausseraient la mesure des étapes
+        "NOMINATIM_RATE_LIMIT": "1e9",
+        "PRIM_RATE_LIMIT": "1e9",
+    })
+    os.environ.pop("ADDRESS_INDEX_DIR", None)
+    os.environ.pop("JOURNEY_CACHE_PATH", None)
+
+
+def version():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnue"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def measure(stage, repeat):
+    """Appelle `stage(i)` une fois pour chauffer puis `repeat` fois ; temps en ms."""
+    stage(-1)
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        stage(i)
+        timings.append(1000 * (time.perf_counter() - start))
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+        "min_ms": timings[0],
+        "runs": len(timings),
+    }
+
+
+def build_stages(repeat):
+    import geocoding
+    import maps
+    import model
+    import prim
+    import velib
+    from bench_station_store import status_updates
+    from geometry import decode_polylines
+
+    info = fixtures.load("station_information")["data"]["stations"]
+    status = fixtures.load("station_status")["data"]["stations"]
+    station_data = velib.build_station_data(info, status)
+    # Chemin de l'application : magasin incrémental puis index spatial, 10 % des stations
+    # modifiées par flux (un flux différent par appel, chauffe comprise)
+    snapshot = velib.StationSnapshot()
+    snapshot._build(info, status, info_changed=True)
+    updates = status_updates(status, 0.1, repeat + 1)
+    journeys = model.parse_journeys(fixtures.load("journeys"))
+    geometries = [section["geometry"] for route in fixtures.load("computedroutes") for section in route["sections"]]
+    paths = decode_polylines(geometries)
+
+    return {
+        # Une adresse différente à chaque appel : toujours un échec de cache
+        "geocode_network": lambda i: geocoding.geocode(f"{i} rue de Rivoli, Paris"),
+        "geocode_cached": lambda i: geocoding.geocode("1 rue de Rivoli, Paris"),
+        "journeys_fetch": lambda i: prim.fetch_journey("2.2945;48.8584", "2.4397;48.8472"),
+        "velib_status_fetch": lambda i: velib.fetch_feed("station_status"),
+        "merge_station_data": lambda i: velib.merge_station_data(info, status),
+        "build_station_data": lambda i: velib.build_station_data(info, status),
+        "station_snapshot_refresh": lambda i: snapshot._build(info, updates[i + 1], info_changed=False),
+        "decode_polylines": lambda i: decode_polylines(geometries),
+        "folium_map": lambda i: [maps.build_journey_map(journey).get_root().render() for journey in journeys],
+        "pydeck_map": lambda i: maps.deck_payload_bytes(maps.build_bike_deck(paths, station_data)),
+    }
+
+
+def find_baseline(current_path):
+    candidates = [path for path in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if path != current_path]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def compare(results, baseline, threshold):
+    """Affiche les écarts avec la référence ; retourne les étapes en régression."""
+    regressions = []
+    print(f"\nComparaison avec {baseline['version']} ({baseline['date']}) :")
+    for name, current in results["stages"].items():
+        reference = baseline["stages"].get(name)
+        if not reference:
+            continue
+        ratio = current["median_ms"] / reference["median_ms"] if reference["median_ms"] else 1.0
+        flag = "  RÉGRESSION" if ratio > threshold else ""
+        print(f"  {name:<24} {reference['median_ms']:9.2f} -> {current['median_ms']:9.2f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0, help="latence ajoutée par le serveur, en ms")
+    parser.add_argument("--jitter", type=float, default=0, help="gigue maximale, en ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction de réponses 503")
+    parser.add_argument("--baseline", help="fichier de résultats de référence (par défaut le plus récent)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="ratio de temps médian au-delà duquel une étape est signalée")
+    parser.add_argument("--output", help="fichier de résultats (par défaut results/<version>.json)")
+    args = parser.parse_args()
+
+    with stub_server.running(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                             error_rate=args.error_rate, seed=0) as server:
+        _configure_environment(server.base_url)
+        import http_client
+
+        results = {
+            "version": version(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "settings": {"repeat": args.repeat, "latency_ms": args.latency, "jitter_ms": args.jitter,
+                         "error_rate": args.error_rate},
+            "stages": {},
+        }
+        for name, stage in build_stages(args.repeat).items():
+            results["stages"][name] = stats = measure(stage, args.repeat)
+            print(f"{name:<24} médiane {stats['median_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms")
+        results["http"] = http_client.get_stats()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['version']}.json")
+    baseline_path = args.baseline or find_baseline(os.path.abspath(output))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRésultats enregistrés dans {output}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != results["settings"]:
+            print("Attention : la référence a été mesurée avec d'autres paramètres")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare un rafraîchissement des stations : jointure pandas complète et mise à jour incrémentale.
+
+Usage : python benchmarks/bench_station_store.py [--changed 0.1] [--repeat N]
+"""
+
+import argparse
+import copy
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+import velib  # noqa: E402
+
+
+def status_updates(status, changed, count):
+    """Flux successifs où une fraction `changed` des stations a un nouveau `last_reported`."""
+    rng = random.Random(4)
+    updates = []
+    for _ in range(count):
+        status = copy.deepcopy(status)
+        for station in rng.sample(status, int(changed * len(status))):
+            mechanical, ebike = rng.randint(0, 12), rng.randint(0, 6)
+            station["num_bikes_available_types"] = [{"mechanical": mechanical}, {"ebike": ebike}]
+            station["num_bikes_available"] = mechanical + ebike
+            station["last_reported"] += 60
+        updates.append(status)
+    return updates
+
+
+def measure(refresh, updates):
+    timings, peaks = [], []
+    for update in updates:
+        tracemalloc.start()
+        start = time.perf_counter()
+        refresh(update)
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(timings), statistics.median(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--changed", type=float, default=0.1, help="fraction de stations modifiées par flux")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    info = fixtures.load("station_information")["data"]["stations"]
+    status = fixtures.load("station_status")["data"]["stations"]
+    updates = status_updates(status, args.changed, args.repeat)
+    print(f"{len(info)} stations, {args.changed:.0%} modifiées par flux")
+
+    snapshot = velib.StationSnapshot()
+    snapshot._apply_status(info, status, info_changed=True)
+    variants = [
+        ("avant (jointure complète)", lambda update: velib.build_station_data(info, update)),
+        ("après (magasin incrémental)", lambda update: snapshot._apply_status(info, update, info_changed=False)),
+    ]
+    baseline = None
+    for label, refresh in variants:
+        elapsed, peak = measure(refresh, updates)
+        baseline = baseline or (elapsed, peak)
+        print(f"{label:<30} {elapsed * 1000:7.2f} ms  pic {peak / 1024:8.1f} Kio  "
+              f"(x{baseline[0] / elapsed:.1f} plus rapide, x{baseline[1] / peak:.1f} moins d'allocations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Vérifie qu'un résultat déjà obtenu est servi quand PRIM échoue, même une fois
+l'heure courante passée dans une autre tranche de cache (`prim.TIME_BUCKET`).
+
+Étapes, contre le serveur local `stub_server` : un premier appel réussi, puis
+l'horloge avancée au-delà de `FRESH_TTL + STALE_TTL` et toutes les réponses en
+503 (échec après nouvelles tentatives), puis disjoncteur ouvert (`CircuitOpenError`),
+et enfin au-delà de `FALLBACK_MAX_AGE`, où l'erreur doit être levée.
+
+Usage : python benchmarks/check_fallback.py
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_server  # noqa: E402
+from bench_stages import _configure_environment  # noqa: E402
+
+FROM, TO = "2.2945;48.8584", "2.4397;48.8472"
+WAYPOINTS = [{"longitude": 2.2945, "latitude": 48.8584}, {"longitude": 2.4397, "latitude": 48.8472}]
+BIKE_DETAILS = {"profile": "city", "eBike": False}
+
+
+class Clock:
+    """Horloge murale décalée de `offset` secondes (tranches et âges du cache)."""
+
+    def __init__(self):
+        self.offset = 0.0
+        self._time = time.time
+
+    def __call__(self):
+        return self._time() + self.offset
+
+
+def check(label, condition):
+    print(f"{'ok' if condition else 'ÉCHEC':<6} {label}")
+    return condition
+
+
+def main():
+    clock = Clock()
+    with stub_server.running() as server:
+        _configure_environment(server.base_url)
+        os.environ.setdefault("BREAKER_COOLDOWN", "60")
+        import cache
+        import http_client
+        import prim
+        import scheduler
+
+        http_client.BACKOFF_BASE = 0.01
+        time.time = clock
+        results = []
+        try:
+            journeys = prim.get_journey(FROM, TO)
+            routes = prim.get_bike_routes(WAYPOINTS, BIKE_DETAILS)
+            results.append(check("premier appel réussi", bool(journeys) and routes is not None))
+
+            clock.offset = prim.FRESH_TTL + prim.STALE_TTL + prim.TIME_BUCKET
+            server.config.error_rate = 1.0
+            for name, call, expected in [
+                ("journeys", lambda: prim.get_journey(FROM, TO), journeys),
+                ("computedroutes", lambda: prim.get_bike_routes(WAYPOINTS, BIKE_DETAILS), routes),
+            ]:
+                try:
+                    value = call()
+                except Exception as e:
+                    value = e
+                age = cache.pop_fallback_age()
+                results.append(check(f"{name} : ancien résultat servi après échec ({value!r:.60})",
+                                     value is expected and age is not None and age >= clock.offset))
+
+            breaker = http_client.get_breaker("journeys")
+            for _ in range(breaker.failures):
+                breaker.record(False)
+            scheduler_error = None
+            try:
+                breaker.before_call()
+            except scheduler.CircuitOpenError as e:
+                scheduler_error = e
+            clock.offset += prim.TIME_BUCKET
+            try:
+                value = prim.get_journey(FROM, TO)
+            except Exception as e:
+                value = e
+            age = cache.pop_fallback_age()
+            results.append(check("journeys : ancien résultat servi disjoncteur ouvert",
+                                 scheduler_error is not None and value is journeys and age is not None))
+            clock.offset = prim.FALLBACK_MAX_AGE + prim.TIME_BUCKET
+            try:
+                value = prim.get_journey(FROM, TO)
+            except scheduler.CircuitOpenError as e:
+                value = e
+            results.append(check("journeys : erreur levée au-delà de FALLBACK_MAX_AGE",
+                                 isinstance(value, scheduler.CircuitOpenError) and cache.pop_fallback_age() is None))
+            stats = prim.cache_stats()
+            results.append(check(f"fallbacks comptés ({stats['journeys']['fallbacks']} journeys, "
+                                 f"{stats['computedroutes']['fallbacks']} computedroutes)",
+                                 stats["journeys"]["fallbacks"] == 2 and stats["computedroutes"]["fallbacks"] == 1))
+        finally:
+            time.time = clock._time
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
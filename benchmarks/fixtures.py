@@ -0,0 +1,133 @@
+"""Réponses d'API utilisées par les benchmarks.
+
+Un fichier `fixtures/<nom>.json` (par exemple une réponse réelle enregistrée) est
+utilisé s'il existe ; sinon une réponse synthétique déterministe, au format de l'API,
+est générée.
+"""
+
+import json
+import math
+import os
+import random
+import zlib
+
+import polyline
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+STATION_COUNT = 1500
+# Emprise approximative du réseau Vélib
+VELIB_BOUNDS = (2.22, 48.78, 2.48, 48.93)
+
+
+def load(name):
+    path = os.path.join(FIXTURES_DIR, f"{name}.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return GENERATORS[name]()
+
+
+def _station_information():
+    rng = random.Random(1)
+    lon_min, lat_min, lon_max, lat_max = VELIB_BOUNDS
+    stations = [
+        {
+            "station_id": 100000 + i,
+            "stationCode": str(10000 + i),
+            "name": f"Station {i} - Rue {rng.choice(['de Rivoli', 'Oberkampf', 'de Vaugirard', 'Lafayette'])}",
+            "lat": round(rng.uniform(lat_min, lat_max), 6),
+            "lon": round(rng.uniform(lon_min, lon_max), 6),
+            "capacity": rng.choice([20, 25, 30, 35, 40]),
+            "rental_methods": ["CREDITCARD"],
+        }
+        for i in range(STATION_COUNT)
+    ]
+    return {"lastUpdatedOther": 1760680000, "ttl": 3600, "data": {"stations": stations}}
+
+
+def _station_status():
+    rng = random.Random(2)
+    stations = []
+    for i in range(STATION_COUNT):
+        mechanical, ebike = rng.randint(0, 12), rng.randint(0, 6)
+        stations.append({
+            "station_id": 100000 + i,
+            "stationCode": str(10000 + i),
+            "num_bikes_available": mechanical + ebike,
+            "numBikesAvailable": mechanical + ebike,
+            "num_bikes_available_types": [{"mechanical": mechanical}, {"ebike": ebike}],
+            "num_docks_available": rng.randint(0, 25),
+            "numDocksAvailable": rng.randint(0, 25),
+            "is_installed": 1,
+            "is_returning": 1,
+            "is_renting": 1,
+            "last_reported": 1760680000 - rng.randint(0, 600),
+        })
+    return {"lastUpdatedOther": 1760680000, "ttl": 60, "data": {"stations": stations}}
+
+
+def _route_points(rng, start, end, count):
+    # Tracé sinueux entre deux points, arrondi au micro-degré comme l'API
+    points = []
+    for i in range(count):
+        t = i / (count - 1)
+        lon = start[0] + (end[0] - start[0]) * t + 0.004 * math.sin(t * 11) + rng.gauss(0, 1e-5)
+        lat = start[1] + (end[1] - start[1]) * t + 0.003 * math.cos(t * 7) + rng.gauss(0, 1e-5)
+        points.append((round(lat, 6), round(lon, 6)))
+    return points
+
+
+def _computedroutes():
+    rng = random.Random(3)
+    origin, destination = (2.2945, 48.8584), (2.4397, 48.8472)
+    routes = []
+    for index, (title, count) in enumerate([("Itinéraire le plus rapide", 900), ("Itinéraire calme", 1400), ("Itinéraire direct", 700)]):
+        via = (2.36 + 0.01 * index, 48.87 - 0.01 * index)
+        sections = [
+            # Géométries encodées avec une précision de 6 décimales
+            {"geometry": polyline.encode(_route_points(rng, origin, via, count // 2), 6)},
+            {"geometry": polyline.encode(_route_points(rng, via, destination, count - count // 2), 6)},
+        ]
+        duration = 1800 + 300 * index
+        routes.append({
+            "title": title,
+            "duration": duration,
+            "estimatedDatetimeOfDeparture": "2026-10-17T08:00:00+02:00",
+            "estimatedDatetimeOfArrival": f"2026-10-17T08:{duration // 60:02d}:00+02:00",
+            "distances": {"total": 11000 + 800 * index},
+            "sections": sections,
+        })
+    return routes
+
+
+_nominatim_recorded = None
+
+
+def nominatim(query):
+    """Réponse Nominatim pour une adresse : enregistrée dans `fixtures/nominatim.json`
+    (dictionnaire adresse -> réponse) si elle y figure, sinon un point déterministe dans Paris."""
+    global _nominatim_recorded
+    if _nominatim_recorded is None:
+        path = os.path.join(FIXTURES_DIR, "nominatim.json")
+        _nominatim_recorded = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                _nominatim_recorded = json.load(f)
+    if query in _nominatim_recorded:
+        return _nominatim_recorded[query]
+
+    rng = random.Random(zlib.crc32(query.encode("utf-8")))
+    lon_min, lat_min, lon_max, lat_max = VELIB_BOUNDS
+    return [{
+        "lat": f"{rng.uniform(lat_min, lat_max):.7f}",
+        "lon": f"{rng.uniform(lon_min, lon_max):.7f}",
+        "display_name": query,
+    }]
+
+
+GENERATORS = {
+    "station_information": _station_information,
+    "station_status": _station_status,
+    "computedroutes": _computedroutes,
+}
@@ -0,0 +1,158 @@
+"""Serveur HTTP local imitant PRIM et Nominatim à partir des réponses de `fixtures`.
+
+Points d'accès servis (mêmes chemins que les vraies API) :
+
+    GET  /marketplace/v2/navitia/journeys
+    POST /marketplace/computedroutes
+    GET  /marketplace/velib/station_information.json
+    GET  /marketplace/velib/station_status.json
+    GET  /search                                  (Nominatim)
+
+Une latence fixe plus une gigue aléatoire est ajoutée à chaque réponse, et une
+fraction des requêtes peut échouer (503) pour exercer les nouvelles tentatives.
+
+Usage : python benchmarks/stub_server.py [--port 8765] [--latency 50] [--jitter 10] [--error-rate 0.05]
+
+puis lancer l'application avec :
+
+    PRIM_BASE_URL=http://127.0.0.1:8765/marketplace NOMINATIM_URL=http://127.0.0.1:8765/search
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+
+
+DEFAULT_PORT = 8765
+# Réponses servies par chemin, sérialisées une seule fois au démarrage
+ROUTES = {
+    ("GET", "/marketplace/v2/navitia/journeys"): "journeys",
+    ("POST", "/marketplace/computedroutes"): "computedroutes",
+    ("GET", "/marketplace/velib/station_information.json"): "station_information",
+    ("GET", "/marketplace/velib/station_status.json"): "station_status",
+}
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency  # secondes
+        self.jitter = jitter  # secondes
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def draw(self):
+        """Retourne (délai, erreur ?) pour une requête."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            self.errors += int(failed)
+        return delay, failed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # connexions persistantes, comme les vraies API
+    # Sans quoi en-têtes et corps envoyés séparément subissent l'ACK retardé (~40 ms par réponse)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        # Le corps est lu pour garder la connexion utilisable, mais ignoré
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond("POST")
+
+    def _respond(self, method):
+        url = urlsplit(self.path)
+        if method == "GET" and url.path == "/search":
+            query = parse_qs(url.query).get("q", [""])[0]
+            body = json.dumps(fixtures.nominatim(query)).encode("utf-8")
+        else:
+            name = ROUTES.get((method, url.path))
+            if name is None:
+                return self._send(404, b'{"message": "Not found"}')
+            body = self.server.bodies[name]
+
+        delay, failed = self.server.config.draw()
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return self._send(503, b'{"message": "Service temporairement indisponible"}')
+        self._send(200, body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.bodies = {name: json.dumps(fixtures.load(name)).encode("utf-8") for name in ROUTES.values()}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def running(port=0, **config):
+    """Démarre le serveur dans un thread (port libre par défaut) le temps du bloc."""
+    server = StubServer(("127.0.0.1", port), StubConfig(**config))
+    thread = threading.Thread(target=server.serve_forever, name="stub-server", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0, help="latence fixe en ms")
+    parser.add_argument("--jitter", type=float, default=0, help="gigue maximale en ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction de réponses 503")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency / 1000, args.jitter / 1000, args.error_rate, args.seed)
+    server = StubServer(("127.0.0.1", args.port), config)
+    print(f"PRIM_BASE_URL={server.base_url}/marketplace NOMINATIM_URL={server.base_url}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"{config.requests} requêtes servies, dont {config.errors} en erreur")
+
+
+if __name__ == "__main__":
+    main()
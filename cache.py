@@ -0,0 +1,339 @@
+"""Caches partagés par toutes les sessions du processus (en mémoire, éventuellement sur disque)."""
+
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import parallel
+import scheduler
+
+
+# Âge de la dernière entrée expirée servie faute de réponse de l'API, dans le contexte courant
+_fallback_age = contextvars.ContextVar("fallback_age", default=None)
+
+
+def pop_fallback_age():
+    """Âge (s) de l'entrée expirée servie par le dernier `get_or_fetch` en échec de ce
+    contexte, ou None ; l'information est oubliée après lecture."""
+    age = _fallback_age.get()
+    _fallback_age.set(None)
+    return age
+
+
+def note_fallback_age(age):
+    """Signale dans ce contexte une entrée expirée servie ailleurs (par exemple dans un
+    thread de `parallel.run_parallel`) ; la plus ancienne est conservée."""
+    if age is not None:
+        current = _fallback_age.get()
+        _fallback_age.set(age if current is None else max(current, age))
+
+
+class LRUCache:
+    """Cache borné à éviction LRU, sûr entre threads, avec compteurs de succès/échecs."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class DiskStore:
+    """Stockage SQLite clé -> valeur JSON horodatée, borné en nombre d'entrées."""
+
+    def __init__(self, path, max_entries=10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries(stored_at)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, payload, stored_at),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key NOT IN"
+                    " (SELECT key FROM entries ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Meneur interrompu (rerun Streamlit...) : rien à partager, les suiveurs recommencent
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Regroupe les appels identiques simultanés : un seul part vers l'API, les autres
+    attendent et partagent son résultat (ou son exception). Si le meneur est interrompu
+    par une exception qui n'est pas une erreur de l'appel (`BaseException` : rerun
+    Streamlit, interruption...), un des suiveurs devient meneur et refait l'appel.
+
+    Les compteurs `upstream_calls` et `coalesced_calls` de `metrics` mesurent les appels
+    effectués et ceux évités.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        while True:
+            with self._lock:
+                call = self._inflight.get(key)
+                leader = call is None
+                if leader:
+                    call = self._inflight[key] = _Call()
+                    self.calls += 1
+                else:
+                    self.shared += 1
+            metrics.increment("upstream_calls" if leader else "coalesced_calls", flight=self.name)
+
+            if not leader:
+                call.done.wait()
+                if call.abandoned:
+                    continue
+                if call.error is not None:
+                    raise call.error
+                return call.value
+
+            try:
+                call.value = fetch()
+            except Exception as e:
+                call.error = e
+                raise
+            except BaseException:
+                call.abandoned = True
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.done.set()
+            return call.value
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+class ResultCache:
+    """Cache de résultats d'API avec service des entrées périmées pendant leur rafraîchissement.
+
+    Une entrée plus jeune que `fresh_ttl` est servie telle quelle. Jusqu'à
+    `fresh_ttl + stale_ttl`, elle est servie immédiatement et un rafraîchissement
+    est lancé en arrière-plan (stale-while-revalidate). Au-delà, l'appel attend
+    l'API, et les appels simultanés pour une même clé partagent une seule requête.
+    Si l'API échoue, une entrée expirée encore présente est servie à la place
+    (voir `pop_fallback_age`), ou à défaut le dernier résultat enregistré sous
+    `fallback_key` (clé sans tranche horaire, qui ne change pas avec l'heure), s'ils
+    ont moins de `max_fallback_age` secondes ; sinon l'erreur est levée. Le niveau
+    mémoire est un LRU ; un `DiskStore` optionnel survit aux redémarrages, les valeurs
+    y étant converties par `encode`/`decode` si elles ne sont pas directement
+    sérialisables en JSON.
+    """
+
+    def __init__(self, name, maxsize, fresh_ttl, stale_ttl, disk=None, encode=None, decode=None,
+                 max_fallback_age=None):
+        self.name = name
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_fallback_age = max_fallback_age
+        self.disk = disk
+        self.encode = encode
+        self.decode = decode
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.fallbacks = 0
+        self._memory = LRUCache(maxsize)
+        self._refreshing = set()
+        self._flight = SingleFlight(name)
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        entry = self._memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                if self.decode is not None:
+                    entry = (self.decode(entry[0]), entry[1])
+                self._memory.set(key, entry)
+        return entry
+
+    def set(self, key, value):
+        entry = (value, time.time())
+        self._memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, self.encode(value) if self.encode is not None else value, entry[1])
+
+    def get_or_fetch(self, key, fetch, fallback_key=None):
+        """Retourne la valeur en cache pour `key`, ou le résultat de `fetch()` (mis en cache).
+
+        Chaque résultat est aussi enregistré sous `fallback_key` s'il est donné.
+        """
+        entry = self._lookup(key)
+        expired = None
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.fresh_ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if age < self.fresh_ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                self._refresh_in_background(key, fetch, fallback_key)
+                return value
+            expired = entry
+
+        with self._lock:
+            self.misses += 1
+        try:
+            return self._flight.do(key, lambda: self._fetch_and_store(key, fetch, fallback_key))
+        except Exception:
+            candidates = [expired]
+            if fallback_key is not None:
+                candidates.append(self._lookup(fallback_key))
+            now = time.time()
+            usable = [
+                entry for entry in candidates
+                if entry is not None and (self.max_fallback_age is None or now - entry[1] <= self.max_fallback_age)
+            ]
+            if not usable:
+                raise
+            # API indisponible ou quota épuisé : mieux vaut un résultat récent qu'une erreur
+            value, stored_at = max(usable, key=lambda entry: entry[1])
+            with self._lock:
+                self.fallbacks += 1
+            metrics.increment("cache_fallbacks", cache=self.name)
+            _fallback_age.set(time.time() - stored_at)
+            return value
+
+    def _store(self, key, value, fallback_key):
+        if value is not None:
+            self.set(key, value)
+            if fallback_key is not None:
+                self.set(fallback_key, value)
+
+    def _fetch_and_store(self, key, fetch, fallback_key=None):
+        value = fetch()
+        self._store(key, value, fallback_key)
+        return value
+
+    def _refresh_in_background(self, key, fetch, fallback_key=None):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.refreshes += 1
+
+        def refresh():
+            try:
+                with scheduler.priority(scheduler.BACKGROUND):
+                    value = fetch()
+                self._store(key, value, fallback_key)
+            except Exception as e:
+                # L'entrée périmée reste servie jusqu'au prochain essai
+                print(f"Erreur lors du rafraîchissement du cache {self.name} : {e}")
+                with self._lock:
+                    self.refresh_errors += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        parallel.get_executor().submit(refresh)
+
+    def stats(self):
+        memory = self._memory.stats()
+        with self._lock:
+            return {
+                "size": memory["size"],
+                "maxsize": memory["maxsize"],
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": memory["evictions"],
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "coalesced": self._flight.stats()["shared"],
+                "fallbacks": self.fallbacks,
+            }
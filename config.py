@@ -0,0 +1,8 @@
+import os
+
+
+API_KEY = os.getenv('API_KEY') 
+
+# URL de base de l'API (modifiable, par exemple pour pointer vers le serveur de benchmarks)
+BASE_URL = os.getenv('PRIM_BASE_URL', 'https://prim.iledefrance-mobilites.fr/marketplace')
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search')
@@ -0,0 +1,167 @@
+"""Géocodage Nominatim avec cache persistant (SQLite) partagé entre sessions et redémarrages."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import http_client
+from address_index import get_address_index, normalize_address
+from cache import SingleFlight
+from config import NOMINATIM_URL
+
+
+USER_AGENT = "MonApplication/1.0 (votre@email.com)"  # User-Agent personnalisé obligatoire
+
+CACHE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "geocode.sqlite3"),
+)
+CACHE_TTL = 30 * 24 * 3600  # secondes
+CACHE_MAX_ENTRIES = 50_000
+MEMORY_MAX_ENTRIES = 2_048
+
+
+class GeocodeCache:
+    """Cache clé -> "lon;lat" sur disque avec TTL et éviction LRU.
+
+    Un petit LRU en mémoire sert les adresses les plus demandées sans toucher
+    à SQLite ; la date d'accès sur disque n'est mise à jour que lors des
+    lectures SQLite, ce qui suffit pour l'éviction.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+                 memory_entries=MEMORY_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS geocode_accessed ON geocode(accessed)")
+
+    def get(self, address):
+        key = normalize_address(address)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if created + self.ttl <= now:
+                self._conn.execute("DELETE FROM geocode WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE geocode SET accessed = ? WHERE key = ?", (now, key))
+            self._remember(key, value, created + self.ttl)
+            return value
+
+    def set(self, address, value):
+        key = normalize_address(address)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._remember(key, value, now + self.ttl)
+            self._inserts += 1
+            # Éviction LRU vérifiée périodiquement plutôt qu'à chaque écriture
+            if self._inserts % 100 == 0:
+                self._evict(now)
+
+    def _remember(self, key, value, expires):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM geocode WHERE created <= ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM geocode").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM geocode WHERE key IN"
+                " (SELECT key FROM geocode ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GeocodeCache()
+    return _cache
+
+
+# Les géocodages simultanés d'une même adresse (toutes sessions confondues) partagent une requête
+_flight = SingleFlight("nominatim")
+
+
+def geocode(address):
+    """Retourne "lon;lat" pour l'adresse, ou None si Nominatim ne trouve rien.
+
+    L'index local d'adresses est consulté en premier, puis le cache, puis Nominatim.
+
+    Les erreurs réseau remontent sous forme de `requests.exceptions.RequestException`.
+    """
+    # Index local d'adresses (optionnel) : aucune requête réseau
+    index = get_address_index()
+    if index is not None:
+        position = index.lookup(address)
+        if position is not None:
+            return f"{position[0]:.6f};{position[1]:.6f}"
+
+    cache = get_cache()
+    coords = cache.get(address)
+    if coords is not None:
+        return coords
+    return _flight.do(normalize_address(address), lambda: _fetch_nominatim(address, cache))
+
+
+def _fetch_nominatim(address, cache):
+    params = {
+        "q": address,
+        "format": "json",
+        "limit": 1,
+        "countrycodes": "fr"  # Limite les recherches à la France
+    }
+    headers = {
+        "User-Agent": USER_AGENT
+    }
+    response = http_client.get("nominatim", NOMINATIM_URL, params=params, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    if not data:
+        return None
+
+    coords = f"{data[0]['lon']};{data[0]['lat']}"
+    cache.set(address, coords)
+    return coords
@@ -0,0 +1,118 @@
+"""Outils géométriques sur les tracés (tableaux NumPy de coordonnées [lon, lat])."""
+
+import numpy as np
+
+
+EARTH_RADIUS = 6_371_000  # mètres
+
+
+def simplify_coordinates(coordinates, tolerance):
+    """Simplifie un tracé avec l'algorithme de Douglas–Peucker.
+
+    `coordinates` est un tableau N×2 de [lon, lat] en degrés et `tolerance` l'écart
+    maximal toléré en mètres. Les extrémités sont toujours conservées ; une tolérance
+    nulle ou négative retourne le tracé inchangé.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    n = len(coordinates)
+    if tolerance <= 0 or n < 3:
+        return coordinates
+
+    # Projection équirectangulaire locale en mètres, suffisante à l'échelle d'un trajet
+    lat0 = np.radians(coordinates[:, 1].mean())
+    xy = np.radians(coordinates) * EARTH_RADIUS
+    xy[:, 0] *= np.cos(lat0)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    # Les segments en attente sont traités niveau par niveau, tous à la fois
+    first = np.array([0])
+    last = np.array([n - 1])
+    while len(first):
+        counts = last - first - 1
+        pending = counts > 0
+        first, last, counts = first[pending], last[pending], counts[pending]
+        if not len(first):
+            break
+        bounds = np.cumsum(counts) - counts
+        segment_id = np.repeat(np.arange(len(first)), counts)
+        offsets = np.arange(counts.sum()) - bounds[segment_id]
+        index = np.repeat(first, counts) + 1 + offsets
+
+        start = xy[first][segment_id]
+        segment = xy[last][segment_id] - start
+        points = xy[index] - start
+        length = np.hypot(segment[:, 0], segment[:, 1])
+        cross = np.abs(segment[:, 0] * points[:, 1] - segment[:, 1] * points[:, 0])
+        distances = np.where(
+            length > 0,
+            cross / np.where(length > 0, length, 1),
+            np.hypot(points[:, 0], points[:, 1]),
+        )
+
+        # Point le plus éloigné de chaque segment (le premier en cas d'égalité)
+        farthest = np.maximum.reduceat(distances, bounds)
+        is_max = distances == farthest[segment_id]
+        candidates = np.flatnonzero(is_max)
+        _, first_hit = np.unique(segment_id[candidates], return_index=True)
+        split_at = candidates[first_hit]
+
+        split = farthest > tolerance
+        split_index = index[split_at][split]
+        keep[split_index] = True
+        first = np.concatenate([first[split], split_index])
+        last = np.concatenate([split_index, last[split]])
+    return coordinates[keep]
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Distance orthodromique en mètres (vectorisée, coordonnées en degrés)."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def decode_polylines(encoded, precision=6):
+    """Décode en une passe NumPy un lot de géométries au format Google Polyline.
+
+    Retourne, pour chaque chaîne, un tableau contigu N×2 de float64 [lon, lat].
+    `precision` est le nombre de décimales de l'encodage (6 pour l'API PRIM).
+    """
+    encoded = [s.encode("ascii") if isinstance(s, str) else s for s in encoded]
+    if not encoded:
+        return []
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64) - 63
+    if len(data) and (data.min() < 0 or data.max() > 63):
+        raise ValueError("Caractère invalide dans la polyligne")
+
+    # Chaque valeur est une suite de blocs de 5 bits ; le dernier n'a pas le bit 0x20
+    ends = np.flatnonzero((data & 0x20) == 0)
+    if len(data) and (not len(ends) or ends[-1] != len(data) - 1):
+        raise ValueError("Polyligne tronquée")
+    starts = np.concatenate(([0], ends[:-1] + 1)) if len(ends) else ends
+    value_id = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 5 * (np.arange(len(data)) - starts[value_id])
+    values = np.add.reduceat((data & 0x1F) << shifts, starts) if len(ends) else ends
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Répartir les valeurs entre les chaînes (une fin de chaîne est toujours une fin de valeur)
+    boundaries = np.cumsum([len(s) for s in encoded])
+    counts = np.bincount(np.searchsorted(boundaries, ends, side="right"), minlength=len(encoded))
+    if np.any(counts % 2):
+        raise ValueError("Polyligne incomplète : nombre impair de valeurs")
+
+    # Les points sont des écarts au point précédent : somme cumulée remise à zéro par chaîne
+    deltas = values.reshape(-1, 2)
+    totals = np.cumsum(deltas, axis=0)
+    first_point = np.concatenate(([0], np.cumsum(counts // 2)[:-1]))
+    offsets = np.vstack([np.zeros((1, 2), dtype=np.int64), totals])[first_point]
+    coordinates = (totals - np.repeat(offsets, counts // 2, axis=0)) / 10.0 ** precision
+
+    lon_lat = np.ascontiguousarray(coordinates[:, ::-1])
+    return np.split(lon_lat, np.cumsum(counts // 2)[:-1])
+
+
+# Fonction pour décoder les géométries Google Polyline
+def decode_polyline(polyline_str, precision=6):
+    """Tableau N×2 de float64 [lon, lat] d'une géométrie Google Polyline."""
+    return decode_polylines([polyline_str], precision)[0]
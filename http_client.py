@@ -0,0 +1,254 @@
+"""Client HTTP partagé par tout le processus pour les appels PRIM et Nominatim."""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scheduler import CircuitBreaker, PriorityScheduler
+
+
+# Délais (connexion, lecture) en secondes pour chaque point d'accès
+TIMEOUTS = {
+    "nominatim": (3.05, 10),
+    "journeys": (3.05, 20),
+    "computedroutes": (3.05, 20),
+    "velib": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# Nouvelles tentatives sur les erreurs temporaires du serveur
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # secondes
+BACKOFF_MAX = 8.0  # secondes
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Taille du pool de connexions gardées ouvertes par hôte
+POOL_MAXSIZE = 20
+
+# Débit maximal (requêtes par seconde) imposé par fournisseur, toutes sessions confondues.
+# Nominatim impose au plus 1 requête par seconde ; tous les appels PRIM partagent la même clé d'API.
+NOMINATIM_RATE_LIMIT = float(os.getenv("NOMINATIM_RATE_LIMIT", 1))
+PRIM_RATE_LIMIT = float(os.getenv("PRIM_RATE_LIMIT", 5))
+RATE_LIMITS = {
+    "nominatim": NOMINATIM_RATE_LIMIT,
+    "prim": PRIM_RATE_LIMIT,
+}
+# Fournisseur (quota et disjoncteur communs) de chaque point d'accès
+PROVIDERS = {
+    "nominatim": "nominatim",
+    "journeys": "prim",
+    "computedroutes": "prim",
+    "velib": "prim",
+}
+
+
+def _parse_quotas(text):
+    # "journeys=2,computedroutes=1" -> {"journeys": 2.0, "computedroutes": 1.0}
+    quotas = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        endpoint, _, rate = item.partition("=")
+        quotas[endpoint.strip()] = float(rate)
+    return quotas
+
+
+# Quotas optionnels propres à un point d'accès (requêtes par seconde), en plus du quota du fournisseur
+ENDPOINT_QUOTAS = _parse_quotas(os.getenv("PRIM_QUOTAS", ""))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Retourne la session unique du processus (connexions réutilisées entre les reruns)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+_limiters = {}
+_breakers = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiters(endpoint):
+    """Ordonnanceurs à traverser pour le point d'accès : son quota propre s'il en a un,
+    puis celui de son fournisseur."""
+    names = [(endpoint, ENDPOINT_QUOTAS.get(endpoint)), (PROVIDERS.get(endpoint), None)]
+    limiters = []
+    with _limiters_lock:
+        for name, rate in names:
+            rate = rate if rate is not None else RATE_LIMITS.get(name)
+            if rate is None:
+                continue
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = PriorityScheduler(name, rate)
+            limiters.append(limiter)
+    return limiters
+
+
+def get_breaker(endpoint):
+    """Disjoncteur du fournisseur du point d'accès (None si le point d'accès est inconnu)."""
+    provider = PROVIDERS.get(endpoint)
+    if provider is None:
+        return None
+    with _limiters_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def scheduler_stats():
+    """Files d'attente par priorité et état des disjoncteurs."""
+    with _limiters_lock:
+        limiters, breakers = dict(_limiters), dict(_breakers)
+    return {
+        "limiters": {name: limiter.stats() for name, limiter in limiters.items()},
+        "breakers": {name: breaker.state for name, breaker in breakers.items()},
+    }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_ms": 1000 * self.total_time / self.calls if self.calls else 0.0,
+            "max_ms": 1000 * self.max_time,
+            "last_ms": 1000 * self.last_time,
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(endpoint, elapsed, retries, error):
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, EndpointStats())
+        stats.calls += 1
+        stats.retries += retries
+        stats.errors += int(error)
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.last_time = elapsed
+
+
+def get_stats():
+    """Statistiques de latence par point d'accès (temps total, nouvelles tentatives comprises)."""
+    with _stats_lock:
+        return {endpoint: stats.as_dict() for endpoint, stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _retry_after(response):
+    # En-tête Retry-After, s'il est fourni sous forme de secondes
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return None
+
+
+def _backoff_delay(attempt, response=None):
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    # Backoff exponentiel avec gigue complète
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(endpoint, method, url, **kwargs):
+    """Envoie une requête via la session partagée.
+
+    Chaque tentative attend son tour auprès des ordonnanceurs du point d'accès
+    (quotas, par priorité). Les erreurs réseau et les statuts 429/5xx sont retentés
+    jusqu'à MAX_RETRIES fois ; un 429 suspend le quota pendant le Retry-After annoncé.
+    Si le fournisseur a trop échoué récemment, `scheduler.CircuitOpenError` est levée
+    sans appel. La dernière réponse est retournée telle quelle : l'appelant reste
+    responsable de `raise_for_status()`.
+    """
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    session = get_session()
+    limiters = get_rate_limiters(endpoint)
+    breaker = get_breaker(endpoint)
+    if breaker is not None:
+        breaker.before_call()
+    start = time.perf_counter()
+    attempt = 0
+    # Issue du dernier appel réellement envoyé à l'API ; None si aucun n'est parti (par exemple
+    # attente dans la file interrompue par un rerun Streamlit), sans effet sur le disjoncteur
+    success = None
+    try:
+        while True:
+            for limiter in limiters:
+                limiter.acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                success = False
+                if attempt >= MAX_RETRIES:
+                    _record(endpoint, time.perf_counter() - start, attempt, error=True)
+                    raise
+                time.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+            except requests.exceptions.RequestException:
+                success = False
+                _record(endpoint, time.perf_counter() - start, attempt, error=True)
+                raise
+
+            success = response.status_code not in RETRY_STATUSES
+            retry_after = _retry_after(response) if response.status_code == 429 else None
+            if retry_after and limiters:
+                # Les quotas suspendus font attendre la prochaine tentative (et les autres appels)
+                for limiter in limiters:
+                    limiter.pause(retry_after)
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = _backoff_delay(attempt, response)
+                response.close()
+                if not (retry_after and limiters):
+                    time.sleep(delay)
+                attempt += 1
+                continue
+
+            _record(endpoint, time.perf_counter() - start, attempt, error=not response.ok)
+            return response
+    finally:
+        if breaker is not None:
+            if success is None:
+                breaker.cancel()
+            else:
+                breaker.record(success)
+
+
+def get(endpoint, url, **kwargs):
+    return request(endpoint, "GET", url, **kwargs)
+
+
+def post(endpoint, url, **kwargs):
+    return request(endpoint, "POST", url, **kwargs)
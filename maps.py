@@ -0,0 +1,177 @@
+"""Construction des cartes des itinéraires : Folium pour les transports publics, pydeck pour le vélo."""
+
+import folium
+import numpy as np
+import pydeck as pdk
+
+import metrics
+from cache import LRUCache
+from geometry import simplify_coordinates
+
+
+# Écart maximal (en mètres) toléré lors de la simplification des tracés ; 0 pour désactiver
+ROUTE_SIMPLIFY_TOLERANCE = 2.0
+
+# Nombre de cartes HTML d'itinéraires gardées en mémoire (toutes sessions confondues)
+MAP_CACHE_SIZE = 128
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+_map_html_cache = LRUCache(MAP_CACHE_SIZE)
+
+# Marge (en mètres) autour de l'itinéraire vélo dans laquelle les stations sont affichées
+STATION_MARGIN = 500
+# Seules colonnes des stations utilisées par la couche et l'infobulle
+STATION_COLUMNS = ["lon", "lat", "tooltip_info"]
+METERS_PER_DEGREE = 111_320
+
+
+# Fonction pour ajouter les itinéraires sur la carte
+def add_route_to_map(map_obj, section, color, dash_array, stops, display_name, mode,
+                     tolerance=ROUTE_SIMPLIFY_TOLERANCE):
+    # Tracé [lon, lat] de la section (`model.Section`), déjà converti en tableau NumPy
+    coordinates = section.geometry
+
+    if coordinates is not None and len(coordinates):
+        coordinates = simplify_coordinates(coordinates, tolerance)
+
+        # Une seule polyline pour toute la section
+        if len(coordinates) >= 2:
+            folium.PolyLine(
+                locations=coordinates[:, ::-1].tolist(),  # [lat, lon] attendu par Folium
+                color=color,
+                weight=4,
+                opacity=0.8,
+                dash_array=dash_array
+            ).add_to(map_obj)
+
+        # Regrouper les arrêts de la section dans un seul calque
+        stops_group = folium.FeatureGroup(name=f"{mode} {display_name}".strip() or "Arrêts", control=False)
+        for stop in stops:
+            folium.CircleMarker(
+                location=[stop.lat, stop.lon],
+                radius=5,
+                color=color,  # Contour
+                fill=True,
+                fill_color="white", # Intérieur blanc
+                fill_opacity=1,
+                tooltip=f"{mode} {display_name} - {stop.name}"  # Affichage du tooltip
+            ).add_to(stops_group)
+        if stops:
+            stops_group.add_to(map_obj)
+
+
+def section_style(section):
+    """Paramètres de tracé d'une section pour `add_route_to_map`."""
+    # Style par défaut : gris, trait continu
+    style = {
+        "color": "#808080",
+        "dash_array": "",
+        "stops": (),
+        "display_name": "",
+        "mode": "",
+    }
+    if section.type in ("street_network", "transfer"):
+        style["dash_array"] = "5, 5"
+    elif section.type == "public_transport":
+        style["color"] = f"#{section.color}"  # Couleur de la ligne
+        style["mode"] = section.mode or "Transport"
+        style["display_name"] = section.name or "Nom indisponible"
+        style["stops"] = section.stops
+    return style
+
+
+def build_journey_map(journey):
+    journey_map = folium.Map(location=[48.8566, 2.3522], zoom_start=12, tiles = "cartodbpositron")  # Coordonnées de Paris par défaut
+    for section in journey.sections:
+        add_route_to_map(journey_map, section, **section_style(section))
+    return journey_map
+
+
+def journey_key(journey):
+    """Empreinte du contenu des sections d'un itinéraire."""
+    return journey.key
+
+
+def journey_map_html(journey, key=None):
+    """HTML autonome de la carte d'un itinéraire, mis en cache selon le contenu de ses sections."""
+    key = key or journey_key(journey)
+    html = _map_html_cache.get(key)
+    if html is None:
+        figure = folium.Figure().add_child(build_journey_map(journey))
+        html = figure.render()
+        _map_html_cache.set(key, html)
+    return html
+
+
+def map_cache_stats():
+    return _map_html_cache.stats()
+
+
+metrics.register_collector("cache", "cache", lambda: {"map_html": map_cache_stats()})
+
+
+def stations_near_paths(station_data, paths, margin=STATION_MARGIN):
+    """Stations situées dans l'emprise des tracés élargie de `margin` mètres, colonnes utiles seulement."""
+    points = np.concatenate([np.asarray(path, dtype=np.float64) for path in paths])
+    lon_min, lat_min = points.min(axis=0)
+    lon_max, lat_max = points.max(axis=0)
+    margin_lat = margin / METERS_PER_DEGREE
+    margin_lon = margin / (METERS_PER_DEGREE * np.cos(np.radians((lat_min + lat_max) / 2)))
+    lon = station_data["lon"].to_numpy()
+    lat = station_data["lat"].to_numpy()
+    inside = (
+        (lon >= lon_min - margin_lon) & (lon <= lon_max + margin_lon)
+        & (lat >= lat_min - margin_lat) & (lat <= lat_max + margin_lat)
+    )
+    return station_data.loc[inside, STATION_COLUMNS]
+
+
+def build_bike_deck(paths, station_data, margin=STATION_MARGIN):
+    """Carte pydeck unique d'un itinéraire vélo : un tracé par section et les stations Vélib proches.
+
+    `paths` est la liste des tracés des sections, chacun un tableau N×2 de [lon, lat].
+    """
+    points = np.concatenate([np.asarray(path, dtype=np.float64) for path in paths])
+    midpoint_lon, midpoint_lat = points.mean(axis=0)
+
+    layers = []
+    if station_data is not None:
+        # Couche des stations Vélib'
+        layers.append(pdk.Layer(
+            "ScatterplotLayer",
+            data=stations_near_paths(station_data, paths, margin),
+            get_position="[lon, lat]",
+            get_radius=25,
+            get_fill_color=[0, 128, 0],  # Couleur des stations
+            pickable=True,
+            auto_highlight=True  # Pour mettre en surbrillance au survol
+        ))
+    # Couche des itinéraires
+    layers.append(pdk.Layer(
+        "PathLayer",
+        data=[{"path": np.asarray(path).tolist()} for path in paths],
+        get_path="path",  # Chaque élément "path" est une liste de [lon, lat]
+        get_width=10,
+        get_color=[0, 0, 255],
+        pickable=True
+    ))
+
+    return pdk.Deck(
+        map_style="mapbox://styles/mapbox/streets-v11",
+        initial_view_state=pdk.ViewState(
+            latitude=float(midpoint_lat),
+            longitude=float(midpoint_lon),
+            zoom=12
+        ),
+        layers=layers,
+        tooltip={
+            "html": "{tooltip_info}",
+            "style": {"color": "white"}
+        }
+    )
+
+
+def deck_payload_bytes(deck):
+    """Taille en octets du JSON envoyé au navigateur pour une carte pydeck."""
+    return len(deck.to_json().encode("utf-8"))
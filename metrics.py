@@ -0,0 +1,236 @@
+"""Temps passé dans chaque étape (géocodage, appels d'API, stations, cartes).
+
+Chaque `span` alimente l'histogramme de son étape, partagé par tout le processus
+(p50/p95/p99 sur les dernières mesures), et la trace de la requête en cours s'il
+y en a une. `increment` tient des compteurs simples (appels évités...) ; les
+statistiques tenues par d'autres modules (caches) sont lues par les fonctions
+enregistrées avec `register_collector`.
+Histogrammes, compteurs et statistiques sont exposés au format texte Prometheus par
+`render_prometheus`, et sur `http://127.0.0.1:<METRICS_PORT>/metrics` si la
+variable d'environnement est définie.
+"""
+
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METRICS_PORT = os.getenv("METRICS_PORT")
+# Nombre de mesures récentes conservées par étape pour le calcul des quantiles
+WINDOW = 2_048
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "itineraire_stage_duration_seconds"
+
+
+class Histogram:
+    """Compteurs cumulés et fenêtre glissante des dernières durées d'une étape."""
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+
+    def snapshot(self):
+        """Retourne (nombre, somme, {quantile: durée}) ; durées en secondes."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total = self.count, self.total
+        quantiles = {
+            q: samples[max(0, math.ceil(q * len(samples)) - 1)] if samples else 0.0
+            for q in QUANTILES
+        }
+        return count, total, quantiles
+
+
+class Trace:
+    """Étapes d'une requête (un rerun Streamlit), alimentées depuis plusieurs threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []  # (étape, début relatif, durée) en secondes
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration):
+        with self._lock:
+            self.spans.append((name, start - self.started, duration))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rows(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+        return [
+            {"étape": name, "début (ms)": round(1000 * start, 1), "durée (ms)": round(1000 * duration, 1)}
+            for name, start, duration in spans
+        ]
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_current_trace = contextvars.ContextVar("trace", default=None)
+_counters = {}  # (nom, étiquettes) -> valeur
+_counters_lock = threading.Lock()
+_collectors = []  # (famille, étiquette, fonction)
+
+
+def get_histogram(name):
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        return histogram
+
+
+def start_trace():
+    """Démarre la trace de la requête courante ; les spans du même contexte y sont ajoutés."""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name):
+    """Mesure la durée du bloc, y compris s'il lève une exception."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        get_histogram(name).observe(duration)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, start, duration)
+
+
+def increment(name, amount=1, **labels):
+    """Ajoute `amount` au compteur `name` ; les étiquettes distinguent les séries."""
+    key = (name, tuple(sorted(labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def counter_rows():
+    with _counters_lock:
+        counters = sorted(_counters.items())
+    return [
+        {"compteur": name, **dict(labels), "valeur": value}
+        for (name, labels), value in counters
+    ]
+
+
+def register_collector(family, label, collect):
+    """Enregistre `collect()`, qui retourne {série: {statistique: valeur}} (par exemple
+    `prim.cache_stats`), exposé sous `itineraire_<famille>_<statistique>{<étiquette>="<série>"}`."""
+    _collectors.append((family, label, collect))
+
+
+def collected_rows(family):
+    """Statistiques de la famille `family`, une ligne par série (panneau de débogage)."""
+    rows = []
+    for name, label, collect in list(_collectors):
+        if name == family:
+            rows.extend({label: series, **values} for series, values in collect().items())
+    return rows
+
+
+def summary_rows():
+    """Quantiles par étape depuis le démarrage du processus, en millisecondes."""
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+    rows = []
+    for name, histogram in histograms:
+        count, _, quantiles = histogram.snapshot()
+        row = {"étape": name, "appels": count}
+        row.update({f"p{round(q * 100)} (ms)": round(1000 * value, 1) for q, value in quantiles.items()})
+        rows.append(row)
+    return rows
+
+
+def render_prometheus():
+    """Histogrammes au format texte Prometheus (type summary)."""
+    lines = [
+        f"# HELP {METRIC_NAME} Durée des étapes de calcul d'itinéraire.",
+        f"# TYPE {METRIC_NAME} summary",
+    ]
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+    for name, histogram in histograms:
+        count, total, quantiles = histogram.snapshot()
+        for q, value in quantiles.items():
+            lines.append(f'{METRIC_NAME}{{stage="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+
+    with _counters_lock:
+        counters = sorted(_counters.items())
+    typed = set()
+    for (name, labels), value in counters:
+        metric = f"itineraire_{name}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+        lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+
+    gauges = {}
+    for family, label, collect in list(_collectors):
+        for series, values in collect().items():
+            for stat, value in values.items():
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"itineraire_{family}_{stat}", []).append(f'{{{label}="{series}"}} {value}')
+    for metric, samples in sorted(gauges.items()):
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{sample}" for sample in samples)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Démarre (une seule fois par processus) le serveur de métriques si un port est configuré."""
+    global _server, _server_started
+    if not port:
+        return None
+    with _server_lock:
+        if not _server_started:
+            _server_started = True
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+            except OSError as e:
+                print(f"Serveur de métriques indisponible sur le port {port} : {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
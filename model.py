@@ -0,0 +1,248 @@
+"""Modèle compact des itinéraires Navitia : seuls les champs affichés sont conservés.
+
+La réponse est décodée une seule fois (avec `orjson` s'il est installé, sinon `json`)
+en objets à `__slots__`. Les horaires sont convertis en `datetime` dès la lecture ;
+les tracés ne sont convertis en tableaux NumPy N×2 de [lon, lat] qu'à leur premier
+usage (carte), la plupart des itinéraires n'étant jamais affichés sur une carte.
+"""
+
+import hashlib
+import itertools
+import json
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # décodeur de la bibliothèque standard, plus lent
+    orjson = None
+
+
+NAVITIA_DATETIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+def loads(payload):
+    """Décode un document JSON (bytes ou str)."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _parse_datetime(value):
+    # Découpage direct de "AAAAMMJJTHHMMSS", bien plus rapide que `strptime`
+    if not value:
+        return None
+    try:
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                        int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    except ValueError:
+        return datetime.strptime(value, NAVITIA_DATETIME_FORMAT)
+
+
+def _format_datetime(value):
+    return value.strftime(NAVITIA_DATETIME_FORMAT) if value else None
+
+
+class Stop:
+    __slots__ = ("name", "lon", "lat")
+
+    def __init__(self, name, lon, lat):
+        self.name = name
+        self.lon = lon
+        self.lat = lat
+
+
+class Section:
+    """Section d'un itinéraire ; `geometry` vaut None si Navitia n'en fournit pas.
+
+    `coordinates` est la liste [[lon, lat], ...] décodée, convertie à la première
+    lecture de `geometry` puis libérée.
+    """
+
+    __slots__ = ("type", "duration", "from_name", "to_name", "mode", "label", "name", "color", "stops",
+                 "_coordinates", "_geometry")
+
+    def __init__(self, type, duration=0, from_name=None, to_name=None, mode=None, label=None, name=None,
+                 color=None, coordinates=None, stops=()):
+        self.type = type
+        self.duration = duration
+        self.from_name = from_name
+        self.to_name = to_name
+        self.mode = mode
+        self.label = label
+        self.name = name
+        self.color = color
+        self.stops = stops
+        self._coordinates = coordinates or None
+        self._geometry = None
+
+    @property
+    def geometry(self):
+        # Sans verrou : les sections sont partagées via le cache, et deux threads peuvent
+        # convertir en même temps ; chacun part de sa propre référence aux coordonnées
+        coordinates = self._coordinates
+        if coordinates is None:
+            return self._geometry
+        geometry = _geometry(coordinates)
+        self._geometry = geometry
+        self._coordinates = None
+        return geometry
+
+    @classmethod
+    def from_navitia(cls, section):
+        informations = section.get("display_informations") or {}
+        stops = []
+        for stop in section.get("stop_date_times") or ():
+            stop_point = stop.get("stop_point") or {}
+            coord = stop_point.get("coord") or {}
+            if coord.get("lat") and coord.get("lon"):
+                stops.append(Stop(stop_point.get("name", "Station inconnue"), float(coord["lon"]), float(coord["lat"])))
+        return cls(
+            type=section.get("type"),
+            duration=section.get("duration", 0),
+            from_name=(section.get("from") or {}).get("name"),
+            to_name=(section.get("to") or {}).get("name"),
+            mode=informations.get("commercial_mode"),
+            label=informations.get("label"),
+            name=informations.get("name"),
+            color=informations.get("color"),
+            coordinates=(section.get("geojson") or {}).get("coordinates"),
+            stops=tuple(stops),
+        )
+
+    def outline(self):
+        """(nombre de points, premier point, dernier point) du tracé, sans le convertir."""
+        points = self._coordinates
+        if points is None:
+            points = self._geometry
+        if points is None:
+            return None
+        try:
+            first, last = points[0], points[-1]
+            return len(points), (float(first[0]), float(first[1])), (float(last[0]), float(last[1]))
+        except (IndexError, TypeError, ValueError):  # tracé invalide, ignoré par `geometry`
+            return len(points)
+
+    def to_dict(self):
+        # Tracé encore sous sa forme décodée : réécrit tel quel, sans passer par NumPy
+        geometry = self._coordinates
+        if geometry is None:
+            geometry = self._geometry
+        return {
+            "type": self.type, "duration": self.duration, "from_name": self.from_name, "to_name": self.to_name,
+            "mode": self.mode, "label": self.label, "name": self.name, "color": self.color,
+            "geometry": geometry.tolist() if isinstance(geometry, np.ndarray) else geometry,
+            "stops": [[stop.name, stop.lon, stop.lat] for stop in self.stops],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["coordinates"] = data.pop("geometry")
+        data["stops"] = tuple(Stop(*stop) for stop in data["stops"])
+        return cls(**data)
+
+
+def _geometry(coordinates):
+    if not coordinates:
+        return None
+    try:
+        if all(len(point) == 2 for point in coordinates):
+            # Cas courant [[lon, lat], ...] : lecture à plat, deux fois plus rapide que `asarray`
+            values = itertools.chain.from_iterable(coordinates)
+            return np.fromiter(values, dtype=np.float64, count=2 * len(coordinates)).reshape(-1, 2)
+        geometry = np.asarray(coordinates, dtype=np.float64)
+        if geometry.ndim != 2 or geometry.shape[1] < 2:
+            raise ValueError(f"points [lon, lat] attendus, forme {geometry.shape}")
+        geometry = geometry[:, :2]
+    except (IndexError, TypeError, ValueError) as e:
+        print(f"Géométrie de section invalide : {e}")
+        return None
+    return np.ascontiguousarray(geometry)
+
+
+class Journey:
+    """Itinéraire de transport public : horaires, durée (s), CO₂ (g), prix (€) et sections.
+
+    `co2_g` et `fare_eur` valent None quand Navitia ne les fournit pas.
+    """
+
+    __slots__ = ("departure", "arrival", "duration", "co2_g", "fare_eur", "sections", "_key")
+
+    def __init__(self, departure, arrival, duration, co2_g, fare_eur, sections):
+        self.departure = departure
+        self.arrival = arrival
+        self.duration = duration
+        self.co2_g = co2_g
+        self.fare_eur = fare_eur
+        self.sections = sections
+        self._key = None
+
+    @classmethod
+    def from_navitia(cls, journey):
+        fare = ((journey.get("fare") or {}).get("total") or {}).get("value")
+        return cls(
+            departure=_parse_datetime(journey.get("departure_date_time")),
+            arrival=_parse_datetime(journey.get("arrival_date_time")),
+            duration=journey.get("duration", 0),
+            co2_g=(journey.get("co2_emission") or {}).get("value"),
+            fare_eur=float(fare) / 100 if fare is not None else None,
+            sections=tuple(Section.from_navitia(section) for section in journey.get("sections") or ()),
+        )
+
+    @property
+    def key(self):
+        """Empreinte du contenu des sections (carte mise en cache, dédoublonnage).
+
+        Les tracés y figurent par leur nombre de points et leurs extrémités, pour ne
+        pas les convertir tant qu'aucune carte n'est affichée.
+        """
+        if self._key is None:
+            digest = hashlib.sha1()
+            for section in self.sections:
+                digest.update(f"{section.type}|{section.label}|{section.from_name}|{section.to_name}|"
+                              f"{section.duration}|{[stop.name for stop in section.stops]}|"
+                              f"{section.outline()}".encode("utf-8"))
+            self._key = digest.hexdigest()
+        return self._key
+
+    def to_dict(self):
+        return {
+            "departure": _format_datetime(self.departure),
+            "arrival": _format_datetime(self.arrival),
+            "duration": self.duration,
+            "co2_g": self.co2_g,
+            "fare_eur": self.fare_eur,
+            "sections": [section.to_dict() for section in self.sections],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            departure=_parse_datetime(data["departure"]),
+            arrival=_parse_datetime(data["arrival"]),
+            duration=data["duration"],
+            co2_g=data["co2_g"],
+            fare_eur=data["fare_eur"],
+            sections=tuple(Section.from_dict(section) for section in data["sections"]),
+        )
+
+
+def parse_journeys(payload):
+    """Itinéraires d'une réponse Navitia (bytes, str ou document déjà décodé)."""
+    if isinstance(payload, (bytes, str)):
+        payload = loads(payload)
+    return [Journey.from_navitia(journey) for journey in payload.get("journeys") or ()]
+
+
+def dump_journeys(journeys):
+    """Forme JSON compacte (cache sur disque)."""
+    return [journey.to_dict() for journey in journeys]
+
+
+def load_journeys(data):
+    """Inverse de `dump_journeys` ; accepte aussi une réponse Navitia brute (ancien format du cache)."""
+    if isinstance(data, dict):
+        return parse_journeys(data)
+    return [Journey.from_dict(journey) for journey in data]
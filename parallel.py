@@ -0,0 +1,76 @@
+"""Exécution simultanée d'appels indépendants sur un pool de threads partagé."""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # utilisation hors Streamlit (traitements par lots)
+    add_script_run_ctx = get_script_run_ctx = None
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:
+    try:  # versions de Streamlit antérieures à 1.39
+        from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+    except ImportError:
+        SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"
+
+
+MAX_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fanout")
+    return _executor
+
+
+def _with_script_run_ctx(call):
+    """Rattache l'appel à la session Streamlit courante pour que `st.error`/`st.warning`
+    émis depuis un thread du pool s'affichent dans la bonne page."""
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    if ctx is None:
+        return call
+
+    def wrapper():
+        thread = threading.current_thread()
+        missing = object()
+        previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, missing)
+        add_script_run_ctx(thread, ctx)
+        try:
+            return call()
+        finally:
+            # Les threads du pool sont réutilisés par d'autres sessions (ou hors Streamlit) :
+            # `add_script_run_ctx(thread, None)` ne détacherait pas le contexte, il le réattacherait
+            if previous is missing:
+                delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+            else:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+    return wrapper
+
+
+def run_parallel(*calls):
+    """Exécute les appels sans argument en même temps et retourne leurs résultats dans l'ordre.
+
+    La latence totale est celle de l'appel le plus lent ; les limites de débit restent
+    appliquées par `http_client`. La première exception levée est propagée.
+    Chaque appel s'exécute dans une copie du contexte de l'appelant (`contextvars`),
+    pour que ses mesures rejoignent la trace de la requête en cours.
+    """
+    if len(calls) == 1:
+        return [calls[0]()]
+    executor = get_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _with_script_run_ctx(call))
+        for call in calls
+    ]
+    return [future.result() for future in futures]
@@ -0,0 +1,146 @@
+"""Appels aux API d'itinéraires PRIM (Navitia et computedroutes), avec cache des résultats.
+
+Les réponses Navitia sont converties dès réception en objets `model.Journey`.
+"""
+
+import os
+import time
+
+import http_client
+import metrics
+import model
+from cache import DiskStore, ResultCache
+from config import API_KEY, BASE_URL
+
+
+# Précision (en décimales) des coordonnées dans les clés de cache : 3 ≈ 100 m
+COORD_PRECISION = int(os.getenv("JOURNEY_CACHE_COORD_PRECISION", 3))
+# Largeur des tranches d'heure de départ partageant une même entrée de cache
+TIME_BUCKET = 300  # secondes
+# Durée pendant laquelle un résultat est servi sans rafraîchissement...
+FRESH_TTL = 120  # secondes
+# ... puis servi immédiatement pendant qu'un rafraîchissement tourne en arrière-plan
+STALE_TTL = 300  # secondes
+CACHE_MAX_ENTRIES = 512
+# Âge maximal d'un résultat servi à la place d'une réponse en échec (horaires d'un départ
+# immédiat vite dépassés) ; au-delà, l'erreur est signalée
+FALLBACK_MAX_AGE = float(os.getenv("JOURNEY_CACHE_FALLBACK_MAX_AGE", 1800))  # secondes
+# Fichier SQLite optionnel pour conserver les résultats entre redémarrages
+CACHE_PATH = os.getenv("JOURNEY_CACHE_PATH")
+
+
+def _disk_store(name):
+    if not CACHE_PATH:
+        return None
+    root, ext = os.path.splitext(CACHE_PATH)
+    return DiskStore(f"{root}-{name}{ext or '.sqlite3'}")
+
+
+journey_cache = ResultCache("journeys", CACHE_MAX_ENTRIES, FRESH_TTL, STALE_TTL, _disk_store("journeys"),
+                            encode=model.dump_journeys, decode=model.load_journeys,
+                            max_fallback_age=FALLBACK_MAX_AGE)
+routes_cache = ResultCache("computedroutes", CACHE_MAX_ENTRIES, FRESH_TTL, STALE_TTL, _disk_store("computedroutes"),
+                           max_fallback_age=FALLBACK_MAX_AGE)
+
+
+def _round_coords(lon, lat):
+    return f"{float(lon):.{COORD_PRECISION}f};{float(lat):.{COORD_PRECISION}f}"
+
+
+def _time_bucket(departure=None):
+    timestamp = departure.timestamp() if departure is not None else time.time()
+    return int(timestamp // TIME_BUCKET)
+
+
+def journey_cache_key(from_coords, to_coords, departure=None):
+    """Clé : coordonnées "lon;lat" arrondies et tranche de l'heure de départ (maintenant par défaut)."""
+    return "|".join([
+        _round_coords(*from_coords.split(";")),
+        _round_coords(*to_coords.split(";")),
+        str(_time_bucket(departure)),
+    ])
+
+
+def journey_fallback_key(from_coords, to_coords):
+    """Clé du dernier itinéraire obtenu pour un départ immédiat, servi si l'API échoue."""
+    return "|".join([_round_coords(*from_coords.split(";")), _round_coords(*to_coords.split(";")), "last"])
+
+
+def _routes_key_parts(waypoints, bike_details):
+    points = [_round_coords(waypoint["longitude"], waypoint["latitude"]) for waypoint in waypoints]
+    options = [f"{name}={bike_details[name]}" for name in sorted(bike_details)]
+    return points + options
+
+
+def routes_cache_key(waypoints, bike_details):
+    """Clé : points de passage arrondis, options du vélo et tranche de l'heure courante."""
+    return "|".join(_routes_key_parts(waypoints, bike_details) + [str(_time_bucket())])
+
+
+def routes_fallback_key(waypoints, bike_details):
+    """Clé du dernier itinéraire vélo obtenu, servi si l'API échoue."""
+    return "|".join(_routes_key_parts(waypoints, bike_details) + ["last"])
+
+
+def fetch_journey(from_coords, to_coords, departure=None):
+    """Interroge l'API Navitia et retourne la liste des `model.Journey` proposés.
+
+    Lève `requests.exceptions.RequestException` en cas d'erreur.
+    """
+    url = f'{BASE_URL}/v2/navitia/journeys'
+    headers = {
+        "apiKey": API_KEY
+    }
+    params = {
+        "from": from_coords,
+        "to": to_coords
+    }
+    if departure is not None:
+        params["datetime"] = departure.strftime(model.NAVITIA_DATETIME_FORMAT)
+        params["datetime_represents"] = "departure"
+    response = http_client.get("journeys", url, headers=headers, params=params)
+    response.raise_for_status()
+    return model.parse_journeys(response.content)
+
+
+def fetch_bike_routes(waypoints, bike_details):
+    """Interroge l'API computedroutes ; lève `requests.exceptions.RequestException` en cas d'erreur."""
+    url = f'{BASE_URL}/computedroutes?geometry=true'
+    data = {
+        "waypoints": waypoints,
+        "bikeDetails": bike_details,
+        "transportModes": ["BIKE"]
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "apikey": API_KEY
+    }
+    response = http_client.post("computedroutes", url, headers=headers, json=data)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_journey(from_coords, to_coords, departure=None):
+    key = journey_cache_key(from_coords, to_coords, departure)
+    # Pour un départ immédiat, la clé change toutes les TIME_BUCKET secondes : le dernier
+    # résultat est aussi conservé sous une clé fixe pour rester disponible si l'API échoue
+    fallback_key = journey_fallback_key(from_coords, to_coords) if departure is None else None
+    return journey_cache.get_or_fetch(key, lambda: fetch_journey(from_coords, to_coords, departure), fallback_key)
+
+
+def get_bike_routes(waypoints, bike_details):
+    key = routes_cache_key(waypoints, bike_details)
+    return routes_cache.get_or_fetch(key, lambda: fetch_bike_routes(waypoints, bike_details),
+                                     routes_fallback_key(waypoints, bike_details))
+
+
+def cache_stats():
+    """Compteurs des caches de résultats (succès, périmés servis, échecs, évictions...)."""
+    return {
+        "journeys": journey_cache.stats(),
+        "computedroutes": routes_cache.stats(),
+    }
+
+
+metrics.register_collector("cache", "cache", cache_stats)
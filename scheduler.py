@@ -0,0 +1,195 @@
+"""Ordonnancement des appels aux API partagées : quotas par priorité et disjoncteur.
+
+Chaque appel porte une priorité (interactive par défaut, arrière-plan pour le
+rafraîchissement des stations et des caches, lot pour `batch.py`), transmise par
+`contextvars` : `with scheduler.priority(scheduler.BATCH): ...`. Quand le quota
+est épuisé, les jetons sont attribués par priorité puis par ordre d'arrivée.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+import metrics
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BATCH: "batch"}
+
+# Disjoncteur : échecs consécutifs avant ouverture, puis durée pendant laquelle les appels échouent tout de suite
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", 30))  # secondes
+
+_priority = contextvars.ContextVar("priority", default=INTERACTIVE)
+_wait_callback = contextvars.ContextVar("wait_callback", default=None)
+
+
+@contextmanager
+def priority(level):
+    """Priorité des appels faits dans le bloc (y compris via `parallel.run_parallel`)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def on_wait(callback):
+    """`callback(position, attente estimée en s)` est appelé quand un appel du bloc doit
+    attendre son tour, puis à chaque fois que sa position change."""
+    token = _wait_callback.set(callback)
+    try:
+        yield
+    finally:
+        _wait_callback.reset(token)
+
+
+class PriorityScheduler:
+    """Seau de jetons partagé entre threads, dont les jetons sont attribués par priorité
+    puis par ordre d'arrivée."""
+
+    def __init__(self, name, rate, capacity=1):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.granted = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._queue = []  # tas de tickets (priorité, numéro d'arrivée)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _position(self, ticket):
+        return sum(1 for other in self._queue if other < ticket)
+
+    def _estimated_wait(self, position):
+        return max(0.0, (position + 1 - self._tokens) / self.rate)
+
+    def acquire(self, level=None):
+        """Attend un jeton ; retourne le temps d'attente en secondes."""
+        level = current_priority() if level is None else level
+        ticket = (level, next(self._counter))
+        callback = _wait_callback.get()
+        start = time.monotonic()
+        notified = None
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    self._refill()
+                    if self._queue[0] == ticket and self._tokens >= 1:
+                        heapq.heappop(self._queue)
+                        self._tokens -= 1
+                        self.granted[level] += 1
+                        self._cond.notify_all()
+                        return time.monotonic() - start
+                    position = self._position(ticket)
+                    wait = self._estimated_wait(position)
+                    if callback is None or position == notified:
+                        self._cond.wait(timeout=max(0.001, (1 - self._tokens) / self.rate))
+                        continue
+                # Le rappel (affichage dans la page) est fait hors du verrou
+                notified = position
+                callback(position, wait)
+        except BaseException:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+            raise
+
+    def pause(self, seconds):
+        """Aucun jeton n'est attribué pendant `seconds` (par exemple après un 429 avec Retry-After)."""
+        with self._cond:
+            self._refill()
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def stats(self):
+        with self._cond:
+            queued = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+            for level, _ in self._queue:
+                queued[PRIORITY_NAMES[level]] += 1
+            return {
+                "rate": self.rate,
+                "queued": queued,
+                "granted": {PRIORITY_NAMES[level]: count for level, count in self.granted.items()},
+            }
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Appel refusé sans contacter l'API, qui a échoué trop souvent récemment."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Service {name} momentanément indisponible, nouvel essai dans {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Disjoncteur : ouvert après `failures` échecs consécutifs, il refuse les appels pendant
+    `cooldown` secondes, puis laisse passer un seul appel d'essai qui le referme s'il réussit."""
+
+    def __init__(self, name, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def before_call(self):
+        """Lève `CircuitOpenError` si l'appel ne doit pas partir."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(self.name, max(remaining, 1.0))
+            self._trial_running = True
+
+    def cancel(self):
+        """Appel abandonné avant d'avoir atteint l'API : libère l'appel d'essai éventuel,
+        sans compter de succès ni d'échec."""
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, success):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self._consecutive_failures = 0
+                self._opened_at = None
+                return
+            self._consecutive_failures += 1
+            if self._opened_at is not None or self._consecutive_failures >= self.failures:
+                if self._opened_at is None:
+                    print(f"Disjoncteur {self.name} ouvert après {self._consecutive_failures} échecs consécutifs")
+                    metrics.increment("circuit_opened", group=self.name)
+                self._opened_at = time.monotonic()
@@ -0,0 +1,123 @@
+"""Index spatial des stations Vélib (grille régulière NumPy) pour les recherches de proximité."""
+
+import math
+
+import numpy as np
+
+from geometry import haversine
+
+
+# Côté d'une cellule de la grille, en mètres
+CELL_SIZE = 500
+METERS_PER_DEGREE = 111_320
+
+
+class StationIndex:
+    """Grille de cellules carrées sur les positions des stations.
+
+    Les stations sont triées par numéro de cellule : les stations d'une ligne de
+    cellules contiguës forment une tranche, retrouvée par recherche dichotomique.
+    Les distances sont calculées par haversine vectorisée sur les seuls candidats.
+    """
+
+    def __init__(self, station_data, cell_size=CELL_SIZE):
+        self.stations = station_data
+        self.cell_size = cell_size
+        lon = station_data["lon"].to_numpy(dtype=np.float64)
+        lat = station_data["lat"].to_numpy(dtype=np.float64)
+
+        self._lon_min, self._lat_min = (lon.min(), lat.min()) if len(lon) else (0.0, 0.0)
+        lat0 = math.radians(lat.mean()) if len(lat) else 0.0
+        self._cell_lat = cell_size / METERS_PER_DEGREE
+        self._cell_lon = cell_size / (METERS_PER_DEGREE * math.cos(lat0))
+        ix = ((lon - self._lon_min) / self._cell_lon).astype(np.int64)
+        iy = ((lat - self._lat_min) / self._cell_lat).astype(np.int64)
+        self._nx = int(ix.max()) + 1 if len(ix) else 1
+        self._ny = int(iy.max()) + 1 if len(iy) else 1
+
+        order = np.argsort(iy * self._nx + ix, kind="stable")
+        self._order = order
+        self._cells = (iy * self._nx + ix)[order]
+        self._lon = lon[order]
+        self._lat = lat[order]
+        self._mechanical = station_data["mechanical_bikes"].to_numpy(dtype=np.int64)[order]
+        self._ebike = station_data["ebike_bikes"].to_numpy(dtype=np.int64)[order]
+        self._docks = station_data["num_docks_available"].to_numpy(dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self._order)
+
+    def _available(self, positions, kind, e_bike):
+        """Filtre de disponibilité : `kind` vaut None, "bike" ou "dock"."""
+        if kind == "bike":
+            bikes = self._ebike if e_bike else self._mechanical
+            return bikes[positions] > 0
+        if kind == "dock":
+            return self._docks[positions] > 0
+        return np.ones(len(positions), dtype=bool)
+
+    def _candidates(self, lon, lat, rings):
+        """Positions (dans l'ordre trié) des stations des cellules à moins de `rings` cellules."""
+        qx = int((lon - self._lon_min) // self._cell_lon)
+        qy = int((lat - self._lat_min) // self._cell_lat)
+        rows = np.arange(max(0, qy - rings), min(self._ny - 1, qy + rings) + 1)
+        x0, x1 = max(0, qx - rings), min(self._nx - 1, qx + rings)
+        if not len(rows) or x0 > x1:
+            return np.empty(0, dtype=np.int64)
+        starts = np.searchsorted(self._cells, rows * self._nx + x0, side="left")
+        ends = np.searchsorted(self._cells, rows * self._nx + x1, side="right")
+        counts = ends - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets
+
+    def _inside_grid(self, lon, lat):
+        return (0 <= lon - self._lon_min < self._nx * self._cell_lon
+                and 0 <= lat - self._lat_min < self._ny * self._cell_lat)
+
+    def _result(self, positions, distances):
+        return self._order[positions], distances
+
+    def nearest(self, lon, lat, k=1, kind=None, e_bike=False):
+        """Les `k` stations disponibles les plus proches, triées par distance.
+
+        Retourne (positions des stations dans `station_data`, distances en mètres).
+
+        Avec `kind="bike"`, seules les stations ayant un vélo du type demandé
+        (électrique si `e_bike`, mécanique sinon) sont retenues ; avec `kind="dock"`,
+        celles ayant une place libre.
+        """
+        if not len(self):
+            return self._result(np.empty(0, dtype=np.int64), np.empty(0))
+        max_rings = max(self._nx, self._ny)
+        rings = 1
+        while True:
+            if self._inside_grid(lon, lat) and rings < max_rings:
+                positions = self._candidates(lon, lat, rings)
+            else:
+                # Point hors de la grille ou grille entièrement parcourue : recherche exhaustive
+                positions = np.arange(len(self))
+                rings = max_rings
+            positions = positions[self._available(positions, kind, e_bike)]
+            distances = haversine(lon, lat, self._lon[positions], self._lat[positions])
+            order = np.argsort(distances)[:k]
+            # Toute station hors du carré parcouru est à plus de `rings` cellules du point
+            covered = rings * self.cell_size * 0.98
+            if rings >= max_rings or (len(order) == k and distances[order[-1]] <= covered):
+                return self._result(positions[order], distances[order])
+            rings *= 2
+
+    def within(self, lon, lat, radius, kind=None, e_bike=False):
+        """Stations disponibles à moins de `radius` mètres, triées par distance.
+
+        Retourne (positions des stations dans `station_data`, distances en mètres).
+        """
+        if self._inside_grid(lon, lat):
+            positions = self._candidates(lon, lat, int(math.ceil(radius / (self.cell_size * 0.98))))
+        else:
+            positions = np.arange(len(self))
+        positions = positions[self._available(positions, kind, e_bike)]
+        distances = haversine(lon, lat, self._lon[positions], self._lat[positions])
+        inside = distances <= radius
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances)
+        return self._result(positions[order], distances[order])
@@ -0,0 +1,145 @@
+"""Statut des stations Vélib en colonnes NumPy, mis à jour de façon incrémentale, avec historique."""
+
+import time
+
+import numpy as np
+
+
+# Instantanés conservés : environ 1 h au rythme du TTL du flux GBFS (60 s)
+HISTORY_SIZE = 64
+# Colonnes conservées dans l'historique
+HISTORY_COLUMNS = ("mechanical", "ebike", "docks")
+COUNT_DTYPE = np.uint16
+
+
+def extract_bike_types(bike_types):
+    """Extraire les vélos mécaniques et électriques depuis `num_bikes_available_types`."""
+    mechanical = next((item.get("mechanical", 0) for item in bike_types if "mechanical" in item), 0)
+    ebike = next((item.get("ebike", 0) for item in bike_types if "ebike" in item), 0)
+    return mechanical, ebike
+
+
+class StationStatusStore:
+    """Dernier statut connu de chaque station, une colonne NumPy par compteur.
+
+    Les lignes suivent l'ordre de `station_ids` (celui du flux station_information).
+    Lors d'une mise à jour, seules les stations dont `last_reported` a changé sont
+    relues. Après chaque mise à jour, les compteurs sont copiés dans un tampon
+    circulaire de `history_size` instantanés, de taille fixe.
+    """
+
+    def __init__(self, station_ids, history_size=HISTORY_SIZE):
+        ids = np.asarray(station_ids, dtype=np.int64)
+        count = len(ids)
+        self.station_ids = ids
+        self._sorter = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._sorter]
+
+        self.bikes = np.zeros(count, dtype=COUNT_DTYPE)
+        self.mechanical = np.zeros(count, dtype=COUNT_DTYPE)
+        self.ebike = np.zeros(count, dtype=COUNT_DTYPE)
+        self.docks = np.zeros(count, dtype=COUNT_DTYPE)
+        self.is_installed = np.zeros(count, dtype=bool)
+        self.is_renting = np.zeros(count, dtype=bool)
+        self.is_returning = np.zeros(count, dtype=bool)
+        self.last_reported = np.zeros(count, dtype=np.int64)
+        # Stations présentes dans au moins un flux de statut
+        self.seen = np.zeros(count, dtype=bool)
+
+        self.history_size = history_size
+        self._history = np.zeros((history_size, len(HISTORY_COLUMNS), count), dtype=COUNT_DTYPE)
+        self._history_times = np.zeros(history_size, dtype=np.float64)
+        self._head = 0  # prochain emplacement écrit
+        self._filled = 0
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    def positions(self, station_ids):
+        """Lignes des stations demandées, -1 pour les stations inconnues."""
+        ids = np.asarray(station_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[found] == ids, self._sorter[found], -1)
+
+    def apply(self, station_status, timestamp=None):
+        """Applique un flux station_status ; retourne les lignes des stations modifiées."""
+        count = len(station_status)
+        ids = np.fromiter((int(status["station_id"]) for status in station_status), dtype=np.int64, count=count)
+        reported = np.fromiter((status.get("last_reported") or 0 for status in station_status),
+                               dtype=np.int64, count=count)
+        rows = self.positions(ids)
+        known = np.flatnonzero(rows >= 0)
+        rows_known = rows[known]
+        changed = known[~self.seen[rows_known] | (reported[known] != self.last_reported[rows_known])]
+
+        for i in changed:
+            status, row = station_status[i], rows[i]
+            mechanical, ebike = extract_bike_types(status.get("num_bikes_available_types", []))
+            self.mechanical[row] = mechanical
+            self.ebike[row] = ebike
+            self.bikes[row] = status.get("num_bikes_available", mechanical + ebike)
+            self.docks[row] = status.get("num_docks_available", 0)
+            self.is_installed[row] = bool(status.get("is_installed", 1))
+            self.is_renting[row] = bool(status.get("is_renting", 1))
+            self.is_returning[row] = bool(status.get("is_returning", 1))
+
+        changed_rows = rows[changed]
+        self.last_reported[changed_rows] = reported[changed]
+        self.seen[changed_rows] = True
+        self._record(time.time() if timestamp is None else timestamp)
+        return changed_rows
+
+    def _record(self, timestamp):
+        for k, column in enumerate(HISTORY_COLUMNS):
+            self._history[self._head, k] = getattr(self, column)
+        self._history_times[self._head] = timestamp
+        self._head = (self._head + 1) % self.history_size
+        self._filled = min(self._filled + 1, self.history_size)
+
+    def _slots(self):
+        """Emplacements de l'historique, du plus ancien au plus récent."""
+        return (self._head - self._filled + np.arange(self._filled)) % self.history_size
+
+    def history(self, row):
+        """Historique d'une station : (horodatages, {colonne: valeurs}), du plus ancien au plus récent."""
+        slots = self._slots()
+        values = self._history[slots][:, :, row]
+        return self._history_times[slots], {column: values[:, k] for k, column in enumerate(HISTORY_COLUMNS)}
+
+    def trend(self, column, window):
+        """Variation de `column` ("mechanical", "ebike", "docks" ou "bikes") sur `window` secondes.
+
+        Retourne (variations par ligne, durée réellement couverte en secondes) ; la
+        durée est plus courte que `window` tant que l'historique est incomplet.
+        """
+        slots = self._slots()
+        if len(slots) < 2:
+            return np.zeros(len(self), dtype=np.int32), 0.0
+        times = self._history_times[slots]
+        first = slots[np.searchsorted(times, times[-1] - window)]
+        last = slots[-1]
+        if column == "bikes":
+            columns = [HISTORY_COLUMNS.index("mechanical"), HISTORY_COLUMNS.index("ebike")]
+        else:
+            columns = [HISTORY_COLUMNS.index(column)]
+        first_values, last_values = self._history[[first, last]][:, columns].astype(np.int32).sum(axis=1)
+        return last_values - first_values, float(self._history_times[last] - self._history_times[first])
+
+    def reindexed(self, station_ids):
+        """Magasin pour une nouvelle liste de stations, qui conserve l'état et l'historique
+        des stations déjà connues (retourne `self` si la liste est inchangée)."""
+        ids = np.asarray(station_ids, dtype=np.int64)
+        if np.array_equal(ids, self.station_ids):
+            return self
+        store = StationStatusStore(ids, self.history_size)
+        old_rows = self.positions(ids)
+        kept = np.flatnonzero(old_rows >= 0)
+        for name in ("bikes", "mechanical", "ebike", "docks", "is_installed", "is_renting", "is_returning",
+                     "last_reported", "seen"):
+            getattr(store, name)[kept] = getattr(self, name)[old_rows[kept]]
+        store._history[:, :, kept] = self._history[:, :, old_rows[kept]]
+        store._history_times[:] = self._history_times
+        store._head, store._filled = self._head, self._filled
+        return store
@@ -0,0 +1,65 @@
+"""Résumé des itinéraires (horaires, durée, CO₂, prix, distance) tel qu'affiché dans les titres."""
+
+from datetime import datetime
+
+
+def summarize_journey(journey):
+    """Résumé d'un itinéraire de transport public (`model.Journey`)."""
+    if journey.departure and journey.arrival:
+        departure_time = journey.departure.strftime('%H:%M')
+        arrival_time = journey.arrival.strftime('%H:%M')
+    else:
+        departure_time, arrival_time = "Inconnu", "Inconnu"
+
+    total_duration = journey.duration
+    if total_duration >= 3600:
+        hours = total_duration // 3600
+        minutes = (total_duration % 3600) // 60
+        duration_str = f"{hours} h {minutes:02d} min"
+    else:
+        duration_str = f"{total_duration // 60} min"
+
+    co2_emission = journey.co2_g
+    co2_str = f"{round(co2_emission)} g" if co2_emission is not None else "Inconnu"
+
+    # Prix non fourni par Navitia : affiché à 0 €, comme auparavant
+    fare_in_euros = journey.fare_eur if journey.fare_eur is not None else 0.0
+    fare_str = f"{fare_in_euros:.2f} €"
+
+    return {
+        "departure": departure_time,
+        "arrival": arrival_time,
+        "duration_s": total_duration,
+        "duration": duration_str,
+        "co2_g": co2_emission,
+        "co2": co2_str,
+        "fare_eur": fare_in_euros,
+        "fare": fare_str,
+    }
+
+
+def summarize_bike_route(journey):
+    """Résumé d'un itinéraire vélo renvoyé par computedroutes."""
+    title = journey.get("title", "Itinéraire")
+    duration = journey.get("duration", 0)
+    departure_time = journey.get("estimatedDatetimeOfDeparture")
+    arrival_time = journey.get("estimatedDatetimeOfArrival")
+
+    # Conversion des durées et heures
+    duration_str = f"{duration // 60} min" if duration < 3600 else f"{duration // 3600} h {duration % 3600 // 60} min"
+    departure_time = datetime.fromisoformat(departure_time).strftime('%H:%M') if departure_time else "Inconnu"
+    arrival_time = datetime.fromisoformat(arrival_time).strftime('%H:%M') if arrival_time else "Inconnu"
+
+    # Détails des distances
+    distances = journey.get("distances", {})
+    total_distance = distances.get("total", 0)
+
+    return {
+        "title": title,
+        "departure": departure_time,
+        "arrival": arrival_time,
+        "duration_s": duration,
+        "duration": duration_str,
+        "distance_m": total_distance,
+        "distance": f"{total_distance / 1000:.1f} km",
+    }
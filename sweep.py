@@ -0,0 +1,112 @@
+"""Balayage d'une plage d'heures de départ : plusieurs requêtes journeys simultanées,
+fusionnées en une liste d'itinéraires distincts classés par durée, CO₂ ou prix.
+
+Les heures sont alignées sur les tranches du cache de `prim` (`prim.TIME_BUCKET`) : deux
+plages qui se recouvrent réutilisent les mêmes entrées de cache. Le débit reste limité
+par `http_client` (quota PRIM et priorité de l'appelant).
+"""
+
+from datetime import datetime, timedelta
+
+import requests
+
+import cache
+import metrics
+import parallel
+import prim
+
+
+# Nombre maximal de requêtes par balayage ; le pas est élargi au besoin
+MAX_DEPARTURES = 12
+# Critères de classement : clés du résumé calculé par `summary.summarize_journey`
+RANKINGS = {
+    "duration_s": lambda journey: journey.duration,
+    "co2_g": lambda journey: journey.co2_g,
+    "fare_eur": lambda journey: journey.fare_eur,
+}
+# Sections sans incidence sur le trajet suivi (attente en station)
+IGNORED_SECTIONS = ("waiting",)
+
+
+def departure_times(start, end, step):
+    """Heures de départ de `start` à `end` inclus, tous les `step`, alignées sur `prim.TIME_BUCKET`."""
+    bucket = prim.TIME_BUCKET
+    step_seconds = max(bucket, round(step.total_seconds() / bucket) * bucket)
+    first = datetime.fromtimestamp(start.timestamp() // bucket * bucket)
+    span = max(0.0, (end - first).total_seconds())
+    count = int(span // step_seconds) + 1
+    if count > MAX_DEPARTURES:
+        step_seconds = -(-span // ((MAX_DEPARTURES - 1) * bucket)) * bucket
+        count = int(span // step_seconds) + 1
+    return [first + timedelta(seconds=i * step_seconds) for i in range(count)]
+
+
+def route_signature(journey):
+    """Suite des sections (type, ligne, arrêts) : identique pour un même trajet à une autre heure."""
+    return tuple(
+        (section.type, section.mode, section.label, section.from_name, section.to_name)
+        for section in journey.sections
+        if section.type not in IGNORED_SECTIONS
+    )
+
+
+def _sort_key(ranking):
+    value = RANKINGS[ranking]
+
+    def key(journey):
+        ranked = value(journey)
+        # Valeur inconnue (CO₂ non fourni...) en fin de liste, puis durée et heure de départ
+        return (ranked is None, ranked or 0, journey.duration, journey.departure or datetime.max)
+
+    return key
+
+
+def merge_journeys(results, ranking="duration_s", start=None, end=None):
+    """Fusionne les listes d'itinéraires : un seul par suite de sections (le mieux classé),
+    parmi ceux qui partent dans la plage si elle est donnée, triés selon `ranking`."""
+    sort_key = _sort_key(ranking)
+    best = {}
+    for journeys in results:
+        for journey in journeys or ():
+            if journey.departure is not None and (
+                    (start is not None and journey.departure < start) or (end is not None and journey.departure > end)):
+                continue
+            signature = route_signature(journey)
+            if signature not in best or sort_key(journey) < sort_key(best[signature]):
+                best[signature] = journey
+    return sorted(best.values(), key=sort_key)
+
+
+def _fetch(from_coords, to_coords, departure):
+    """Une heure du balayage ; retourne (itinéraires, âge d'un résultat de secours, erreur)."""
+    try:
+        journeys = prim.get_journey(from_coords, to_coords, departure)
+    except requests.exceptions.RequestException as e:
+        return None, None, e
+    return journeys, cache.pop_fallback_age(), None
+
+
+def sweep_journeys(from_coords, to_coords, start, end, step=timedelta(minutes=10), ranking="duration_s"):
+    """Itinéraires distincts partant entre `start` et `end`, classés selon `ranking`
+    ("duration_s", "co2_g" ou "fare_eur").
+
+    Une heure en échec est ignorée ; `requests.exceptions.RequestException` n'est levée
+    que si toutes échouent.
+    """
+    if ranking not in RANKINGS:
+        raise ValueError(f"Classement inconnu : {ranking}")
+    departures = departure_times(start, end, step)
+    metrics.increment("sweep_departures", len(departures))
+    outcomes = parallel.run_parallel(*[
+        lambda departure=departure: _fetch(from_coords, to_coords, departure)
+        for departure in departures
+    ])
+
+    errors = [error for _, _, error in outcomes if error is not None]
+    if len(errors) == len(outcomes):
+        raise errors[0]
+    if errors:
+        print(f"Balayage : {len(errors)} heure(s) de départ sur {len(outcomes)} en échec : {errors[0]}")
+    for _, fallback_age, _ in outcomes:
+        cache.note_fallback_age(fallback_age)
+    return merge_journeys((journeys for journeys, _, _ in outcomes), ranking, start, end)
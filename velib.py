@@ -0,0 +1,250 @@
+"""Données des stations Vélib : récupération, fusion et instantané partagé rafraîchi en arrière-plan."""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import http_client
+import metrics
+import parallel
+import scheduler
+from station_index import StationIndex
+from station_store import StationStatusStore, extract_bike_types
+from config import API_KEY, BASE_URL
+
+
+# Les informations des stations (nom, position, capacité) changent rarement
+INFO_REFRESH_INTERVAL = 3600  # secondes
+# Le statut suit le TTL annoncé par le flux GBFS, borné pour ne pas surcharger l'API
+DEFAULT_STATUS_TTL = 60  # secondes
+MIN_STATUS_TTL = 10  # secondes
+# Délai d'attente après une erreur avant de réessayer
+ERROR_RETRY_INTERVAL = 15  # secondes
+# Attente maximale d'une session lors du tout premier chargement du processus
+FIRST_LOAD_TIMEOUT = 15  # secondes
+# Période sur laquelle est calculée l'évolution des vélos et places de chaque station
+TREND_WINDOW = 1800  # secondes
+
+
+def fetch_feed(name):
+    """Récupère un flux GBFS Vélib et retourne (stations, ttl).
+
+    Lève `requests.exceptions.RequestException` en cas d'erreur.
+    """
+    url = f'{BASE_URL}/velib/{name}.json'
+    headers = {
+        'apiKey': API_KEY
+    }
+    response = http_client.get("velib", url, headers=headers)
+    response.raise_for_status()
+    payload = response.json()
+    return payload.get("data", {}).get("stations", []), payload.get("ttl")
+
+
+# Fonction pour obtenir les données de disponibilité des vélos et bornes
+def get_station_status():
+    return fetch_feed("station_status")
+
+
+# Fonction pour obtenir les données vélib
+def get_station_information():
+    return fetch_feed("station_information")
+
+
+# Combiner les informations des stations et leurs statuts
+def merge_station_data(station_info, station_status):
+    info_df = pd.DataFrame(station_info)
+    status_df = pd.DataFrame(station_status)
+    # Fusionner les deux DataFrames sur "station_id"
+    merged_data = pd.merge(info_df, status_df, on="station_id", how="inner")
+    return merged_data
+
+
+def station_tooltips(station_data):
+    """Texte du tooltip de chaque station de la carte."""
+    return (
+        "<b>Nom:</b> " + station_data["name"] + "<br/>"
+        "<b>Vélos disponibles:</b> " + station_data["num_bikes_available"].astype(str) + "<br/>"
+        "<b>Types de vélos:</b> " +
+        "Mécaniques: " + station_data["mechanical_bikes"].astype(str) + ", Électriques: " + station_data["ebike_bikes"].astype(str) + "<br/>"
+        "<b>Places libres:</b> " + station_data["num_docks_available"].astype(str)
+    )
+
+
+def build_station_data(station_info, station_status):
+    """Fusionne informations et statuts et ajoute les colonnes utilisées par la carte."""
+    station_data = merge_station_data(station_info, station_status)
+
+    station_data["mechanical_bikes"], station_data["ebike_bikes"] = zip(
+        *station_data["num_bikes_available_types"].apply(extract_bike_types)
+    )
+
+    # Ajouter une colonne avec des informations détaillées pour le tooltip
+    station_data["tooltip_info"] = station_tooltips(station_data)
+    return station_data
+
+
+class StationSnapshot:
+    """Tableau fusionné des stations, reconstruit par un thread d'arrière-plan.
+
+    Les sessions lisent le dernier tableau construit sans jamais attendre le réseau ;
+    il ne doit pas être modifié en place par les lecteurs.
+
+    Les statuts sont appliqués à un magasin en colonnes (`StationStatusStore`) qui ne
+    relit que les stations modifiées et garde l'historique récent des disponibilités.
+    """
+
+    def __init__(self, info_interval=INFO_REFRESH_INTERVAL):
+        self.info_interval = info_interval
+        self.last_error = None
+        self._station_info = None
+        self._info_fetched_at = 0.0
+        self._info_frame = None
+        self._store = None
+        self._tooltips = None
+        self._station_data = None
+        self._station_index = None
+        self._updated_at = None
+        self._status_ttl = DEFAULT_STATUS_TTL
+        self._ready = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="velib-refresh", daemon=True)
+                self._thread.start()
+
+    def get(self):
+        """Retourne (station_data, âge en secondes), ou (None, None) si rien n'est encore chargé."""
+        with self._lock:
+            station_data, updated_at = self._station_data, self._updated_at
+        if station_data is None:
+            return None, None
+        return station_data, time.time() - updated_at
+
+    def get_index(self):
+        """Index spatial construit avec le dernier tableau (None si rien n'est encore chargé)."""
+        with self._lock:
+            return self._station_index
+
+    def wait_ready(self, timeout=None):
+        """Attend la fin de la première tentative de chargement."""
+        return self._ready.wait(timeout)
+
+    def refresh(self):
+        """Rafraîchit le statut, et les informations si elles sont périmées."""
+        now = time.time()
+        station_info = self._station_info
+        info_changed = station_info is None or now - self._info_fetched_at >= self.info_interval
+        with metrics.span("velib_fetch"):
+            if info_changed:
+                # Les deux flux sont indépendants : les récupérer en même temps
+                (station_info, _), (station_status, ttl) = parallel.run_parallel(
+                    get_station_information, get_station_status
+                )
+                self._station_info, self._info_fetched_at = station_info, now
+            else:
+                station_status, ttl = get_station_status()
+        if ttl:
+            self._status_ttl = max(MIN_STATUS_TTL, int(ttl))
+
+        with metrics.span("velib_merge"):
+            station_data, station_index = self._build(station_info, station_status, info_changed)
+        with self._lock:
+            self._station_data, self._station_index = station_data, station_index
+            self._updated_at = time.time()
+
+    def _build(self, station_info, station_status, info_changed):
+        """Tableau des stations à publier et son index spatial."""
+        station_data = self._apply_status(station_info, station_status, info_changed)
+        return station_data, StationIndex(station_data)
+
+    def _apply_status(self, station_info, station_status, info_changed):
+        """Met à jour le magasin et retourne un nouveau tableau des stations, avec les mêmes
+        colonnes que `build_station_data` plus l'évolution sur TREND_WINDOW
+        (`mechanical_trend`, `ebike_trend`, `docks_trend`, et la durée couverte dans `attrs["trend_seconds"]`)."""
+        if info_changed or self._store is None:
+            self._info_frame = pd.DataFrame(station_info)
+            station_ids = self._info_frame["station_id"].to_numpy()
+            self._store = self._store.reindexed(station_ids) if self._store is not None else StationStatusStore(station_ids)
+            self._tooltips = np.empty(len(station_ids), dtype=object)
+
+        store = self._store
+        changed = store.apply(station_status)
+        if info_changed:
+            # Tooltips à recalculer pour toutes les stations (noms éventuellement modifiés)
+            changed = np.arange(len(store))
+
+        if len(changed):
+            self._tooltips[changed] = station_tooltips(pd.DataFrame({
+                "name": self._info_frame["name"].to_numpy()[changed],
+                "num_bikes_available": store.bikes[changed],
+                "mechanical_bikes": store.mechanical[changed],
+                "ebike_bikes": store.ebike[changed],
+                "num_docks_available": store.docks[changed],
+            })).to_numpy()
+
+        mechanical_trend, covered = store.trend("mechanical", TREND_WINDOW)
+        ebike_trend, _ = store.trend("ebike", TREND_WINDOW)
+        docks_trend, _ = store.trend("docks", TREND_WINDOW)
+        # Copies : le magasin continue d'évoluer alors que le tableau publié ne doit plus changer
+        status_columns = pd.DataFrame({
+            "num_bikes_available": store.bikes.astype(np.int64),
+            "num_docks_available": store.docks.astype(np.int64),
+            "mechanical_bikes": store.mechanical.astype(np.int64),
+            "ebike_bikes": store.ebike.astype(np.int64),
+            "is_installed": store.is_installed.copy(),
+            "is_renting": store.is_renting.copy(),
+            "is_returning": store.is_returning.copy(),
+            "last_reported": store.last_reported.copy(),
+            "mechanical_trend": mechanical_trend,
+            "ebike_trend": ebike_trend,
+            "docks_trend": docks_trend,
+            "tooltip_info": self._tooltips.copy(),
+        }, index=self._info_frame.index)
+        # Une seule concaténation : bien moins coûteuse que l'ajout des colonnes une à une
+        station_data = pd.concat([self._info_frame, status_columns], axis=1)
+
+        # Comme la jointure interne : seulement les stations présentes dans les deux flux
+        if not store.seen.all():
+            station_data = station_data[store.seen].reset_index(drop=True)
+        station_data.attrs["trend_seconds"] = covered
+        return station_data
+
+    def _run(self):
+        while True:
+            try:
+                # Les flux passent après les demandes d'itinéraires des utilisateurs
+                with scheduler.priority(scheduler.BACKGROUND):
+                    self.refresh()
+                self.last_error = None
+                delay = self._status_ttl
+            except Exception as e:
+                # Conserver le dernier instantané valide et réessayer plus tard
+                print(f"Erreur lors du rafraîchissement des stations Vélib : {e}")
+                self.last_error = e
+                delay = ERROR_RETRY_INTERVAL
+            # Débloquer les sessions en attente du premier chargement, même en cas d'échec
+            self._ready.set()
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Instantané unique du processus ; le thread de rafraîchissement démarre au premier appel."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = StationSnapshot()
+                _snapshot.start()
+    return _snapshot